@@ -1,13 +1,37 @@
 from django.contrib import admin
-from django.db.models import Sum
-from base.utils import export_orders_csv, generate_factor_pdf
+from django.db import transaction
+from base.utils import export_orders_csv, export_orders_xlsx, generate_factor_pdf
 from jalali_date.admin import ModelAdminJalaliMixin, TabularInlineJalaliMixin
 import jdatetime
-from base.models import Company, Order, Factor
+from base.models import Company, Order, Factor, FactorJob
+from base.cache import COMPANY_CHOICES_TIMEOUT, company_choices_key, get_order_summary
+from base.jobs import factor_job_path
+from base.imports import import_orders
+from base.signals import deferred_company_totals
+from base.pagination import (
+    KEYSET_AFTER_VAR, KEYSET_BEFORE_VAR, KEYSET_ORDERING, EstimatedCountPaginator, decode_cursor, encode_cursor,
+    keyset_page,
+)
+from base.search import (
+    name_and_phone_prefix, normalize_search_text, order_search_enabled, search_name_and_phone, search_orders,
+)
 from base.templatetags.farsi_numbers import farsi_comma
 from django import forms
 from datetime import timedelta, time, datetime
 from django.contrib.admin import SimpleListFilter
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.forms.models import BaseInlineFormSet
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList, ORDER_VAR
+from django.core.cache import cache
+from django.db.models import Case, Value, When
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.http import FileResponse, Http404, JsonResponse, QueryDict
+from django.shortcuts import get_object_or_404, redirect
+from django.template.response import TemplateResponse
+from django.contrib import messages
+from django.urls import path, reverse
+from django.utils.html import format_html
 # Register your models here.
 
 class Admin(admin.ModelAdmin):
@@ -152,15 +176,116 @@ class FactorDateRangeFilter(SimpleListFilter):
         else:
             return queryset
         return queryset.filter(factor_date__range=(start, end))
-    
+
+
+# شرکت‌های هر صفحه از نتایج جستجوی فیلتر شرکت
+COMPANY_CHOICES_PER_PAGE = 20
+# سفارش‌های هر صفحه از سفارش‌های شرکت در صفحه ویرایش شرکت
+ORDER_INLINE_PER_PAGE = 20
+
+
+class CompanyListFilter(SimpleListFilter):
+    """
+    Filter by company id. Only the chosen company is listed; others are
+    picked through a select2 box fed by CompanyAdmin.choices_view, so the
+    changelist never reads the whole company table.
+    """
+    title = 'شرکت'
+    parameter_name = 'company'
+    template = 'admin/base/company_filter.html'
+    field_name = None
+
+    def lookups(self, request, model_admin):
+        if not (self.value() or '').isdigit():
+            return []
+        return Company.objects.filter(pk=self.value()).values_list('pk', 'name')
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        self.choices_url = reverse('admin:base_company_choices')
+        self.select_query_string = changelist.get_query_string(remove=[self.parameter_name])
+        return super().choices(changelist)
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        if not self.value().isdigit():
+            raise IncorrectLookupParameters(self.value())
+        return queryset.filter(**{self.field_name: self.value()})
+
+
+class OrderCompanyFilter(CompanyListFilter):
+    field_name = 'company_name'
+
+
+class FactorCompanyFilter(CompanyListFilter):
+    field_name = 'company'
+
+
+def company_filter_media():
+    # select2 و autocomplete.js مدیریت جنگو، به همان ترتیب فیلدهای autocomplete
+    widget = AutocompleteSelect(Order._meta.get_field('company_name'), admin.site)
+    return widget.media + forms.Media(js=['js/company_filter.js'])
+
+
+class OrderInlineForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # ویجت تاریخ میکروثانیه را نشان نمی‌دهد؛ بدون این، هر ردیف تغییرکرده حساب می‌شد و دوباره ذخیره می‌شد
+        if self.instance.pk and self.instance.order_date:
+            self.initial['order_date'] = self.instance.order_date.replace(microsecond=0)
+
+
+class OrderInlineFormSet(BaseInlineFormSet):
+    """
+    One keyset page of the company's orders, newest first, chosen by the
+    `after`/`before` cursors of the change page URL. Only that page is
+    rendered and, on save, validated; the form posts back to the same URL,
+    so it is the same page.
+    """
+
+    def __init__(self, *args, params=None, **kwargs):
+        self.params = params if params is not None else QueryDict()
+        super().__init__(*args, **kwargs)
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            self._queryset, has_previous, has_next = keyset_page(
+                self.queryset, ORDER_INLINE_PER_PAGE,
+                decode_cursor(self.params.get(KEYSET_AFTER_VAR)), decode_cursor(self.params.get(KEYSET_BEFORE_VAR)),
+            )
+            orders = list(self._queryset)
+            self.first_url = has_previous and self.page_url()
+            self.previous_url = has_previous and bool(orders) and self.page_url(
+                **{KEYSET_BEFORE_VAR: encode_cursor(orders[0])})
+            self.next_url = has_next and self.page_url(**{KEYSET_AFTER_VAR: encode_cursor(orders[-1])})
+        return self._queryset
+
+    def page_url(self, **cursor):
+        params = self.params.copy()
+        params.pop(KEYSET_AFTER_VAR, None)
+        params.pop(KEYSET_BEFORE_VAR, None)
+        params.update(cursor)
+        return f'?{params.urlencode()}#{self.prefix}-group'
+
 
 # Order Inline for Company Admin
 class OrderInline(TabularInlineJalaliMixin, admin.TabularInline):
     model = Order
+    form = OrderInlineForm
+    formset = OrderInlineFormSet
+    template = 'admin/base/company/order_inline.html'
     extra = 0
     fields = ('title', 'unit_cost', 'total_cost', 'payment', 'remaining_payment', 'order_status', 'payment_status', 'order_date')
     readonly_fields = ('remaining_payment',)
     can_delete = False # Prevent deleting orders directly from company admin if not desired
+    show_change_link = True
+
+    def get_queryset(self, request):
+        # عنوان هر ردیف (Order.__str__) نام شرکت را نشان می‌دهد
+        return super().get_queryset(request).select_related('company_name')
 
 
 @admin.register(Company)
@@ -199,6 +324,62 @@ class CompanyAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     total_orders_display.short_description = "تعداد سفارشات"
     total_orders_display.admin_order_field = 'total_orders'
 
+    def get_search_results(self, request, queryset, search_term):
+        # شرکت‌هایی که نام یا شماره نرمال‌شده‌شان با عبارت شروع می‌شود اول (search_prefix=0)،
+        # سپس بقیه تطابق‌ها در نام نرمال‌شده، آدرس و شماره؛ برای فهرست، autocomplete سفارش‌ها و فیلتر شرکت
+        if not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        prefix = name_and_phone_prefix(search_term, 'name_search', 'phone_search')
+        others, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        matches = others | queryset.filter(name_search__contains=normalize_search_text(search_term))
+        if prefix is not None:
+            matches |= queryset.filter(prefix)
+        matches = matches.annotate(search_prefix=(
+            Case(When(prefix, then=Value(0)), default=Value(1)) if prefix is not None else Value(1)
+        ))
+        # ترتیبی که کاربر برای ستونی انتخاب کرده، بر ترتیب تطابق مقدم است
+        if ORDER_VAR not in request.GET:
+            matches = matches.order_by('search_prefix', *(queryset.query.order_by or self.model._meta.ordering))
+        return matches, may_have_duplicates
+
+    def get_formset_kwargs(self, request, obj, inline, prefix):
+        kwargs = super().get_formset_kwargs(request, obj, inline, prefix)
+        if isinstance(inline, OrderInline):
+            kwargs['params'] = request.GET
+        return kwargs
+
+    def get_urls(self):
+        urls = [
+            path('choices/', self.admin_site.admin_view(self.choices_view), name='base_company_choices'),
+        ]
+        return urls + super().get_urls()
+
+    def choices_view(self, request):
+        """Company choices of the order and factor company filters, in the admin autocomplete JSON format."""
+        if not any(self.admin_site._registry[model].has_view_permission(request) for model in (Company, Order, Factor)):
+            raise PermissionDenied
+        term = request.GET.get('term', '')
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+
+        key = company_choices_key(term, page)
+        data = cache.get(key)
+        if data is None:
+            queryset, _ = self.get_search_results(request, Company.objects.all(), term)
+            start = (page - 1) * COMPANY_CHOICES_PER_PAGE
+            # name_search ایندکس دارد؛ مرتب‌سازی بر اساس name کل جدول را مرتب می‌کرد
+            ordering = ('search_prefix', 'name_search', 'pk') if term else ('name_search', 'pk')
+            rows = list(queryset.order_by(*ordering).values_list('pk', 'name')
+                        [start:start + COMPANY_CHOICES_PER_PAGE + 1])
+            data = {
+                'results': [{'id': str(pk), 'text': name} for pk, name in rows[:COMPANY_CHOICES_PER_PAGE]],
+                'pagination': {'more': len(rows) > COMPANY_CHOICES_PER_PAGE},
+            }
+            cache.set(key, data, COMPANY_CHOICES_TIMEOUT)
+        return JsonResponse(data)
+
 
 class OrderForm(forms.ModelForm):
     class Meta:
@@ -229,6 +410,70 @@ class OrderForm(forms.ModelForm):
         return remaining_payment
 
 
+# columns of the Order changelist: list_display, list_editable and keyset paging
+ORDER_CHANGELIST_FIELDS = (
+    'title', 'customer_name', 'company_name__name', 'width', 'height', 'amount', 'unit_cost', 'total_cost',
+    'payment', 'remaining_payment', 'order_status', 'payment_status', 'order_date',
+)
+
+
+class OrderChangeList(ChangeList):
+    """
+    Changelist paging by keyset on (order_date, id) when sorted by the
+    default newest-first order, with an estimated result count. Other
+    orderings, searches and "show all" page by number with the exact count.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        # مکان‌نمای صفحه فیلتر نیست؛ از پارامترها جدا می‌شود تا لینک فیلترها، مرتب‌سازی و جستجو از صفحه اول شروع شوند
+        self.keyset_after = decode_cursor(request.GET.get(KEYSET_AFTER_VAR))
+        self.keyset_before = decode_cursor(request.GET.get(KEYSET_BEFORE_VAR))
+        if KEYSET_AFTER_VAR in request.GET or KEYSET_BEFORE_VAR in request.GET:
+            request.GET = request.GET.copy()
+            request.GET.pop(KEYSET_AFTER_VAR, None)
+            request.GET.pop(KEYSET_BEFORE_VAR, None)
+        super().__init__(request, *args, **kwargs)
+
+    def get_results(self, request):
+        self.keyset = self.queryset.query.order_by == KEYSET_ORDERING and not self.show_all
+        if not self.keyset:
+            return super().get_results(request)
+
+        # شمارش محدود فقط برای صفحه‌بندی keyset؛ صفحه‌های شماره‌دار تعداد دقیق لازم دارند
+        self.paginator = EstimatedCountPaginator(self.queryset, self.list_per_page)
+        self.result_count = self.paginator.count
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.result_list, has_previous, has_next = keyset_page(
+            self.queryset, self.list_per_page, self.keyset_after, self.keyset_before)
+        self.can_show_all = self.result_count <= self.list_max_show_all
+        self.multi_page = has_previous or has_next
+        orders = list(self.result_list)
+        self.keyset_first_url = has_previous and self.get_query_string()
+        self.keyset_previous_url = has_previous and bool(orders) and self.get_query_string(
+            {KEYSET_BEFORE_VAR: encode_cursor(orders[0])})
+        self.keyset_next_url = has_next and self.get_query_string({KEYSET_AFTER_VAR: encode_cursor(orders[-1])})
+
+    def get_queryset(self, request, exclude_parameters=None):
+        # فقط ستون‌هایی که لیست نمایش می‌دهد یا ویرایش می‌کند
+        queryset = super().get_queryset(request, exclude_parameters).only(*ORDER_CHANGELIST_FIELDS)
+        # نتایج جستجو به ترتیب میزان تطابق، مگر اینکه کاربر ستونی را برای مرتب‌سازی انتخاب کند
+        # (ChangeList ترتیب را پیش از جستجو تعیین می‌کند)
+        if self.query and ORDER_VAR not in self.params and 'search_rank' in queryset.query.extra:
+            queryset = queryset.order_by('search_rank', '-order_date', '-pk')
+        return queryset
+
+
+class OrderImportForm(forms.Form):
+    file = forms.FileField(label="فایل سفارشات", help_text="فایل CSV یا XLSX با سرستون‌های خروجی سفارشات.")
+    dry_run = forms.BooleanField(label="فقط بررسی، بدون ثبت", required=False)
+
+
+# نمایش حداکثر این تعداد خطا در صفحه ورود سفارشات
+ORDER_IMPORT_ERRORS_SHOWN = 100
+
+
 @admin.register(Order)
 class OrderAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     form = OrderForm
@@ -251,12 +496,13 @@ class OrderAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
         OrderPaymentFilter,
         OrderStatusFilter,
         OrderDateRangeFilter,
-        'company_name__name', # Filter by company name
+        OrderCompanyFilter,
     )
     readonly_fields = ["total_cost", "remaining_payment"]
     search_fields = ('title', 'description', 'customer_name', 'company_name__name')
-    actions = [generate_factor_pdf, export_orders_csv]
+    actions = [generate_factor_pdf, export_orders_csv, export_orders_xlsx]
     autocomplete_fields = ['company_name'] # Useful for large number of companies
+    show_full_result_count = False # Avoid a second COUNT(*) over all orders
 
 
     # Display customer name or company name
@@ -268,6 +514,10 @@ class OrderAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
         return "نامشخص"
     display_customer.short_description = "مشتری/شرکت"
 
+    def get_queryset(self, request):
+        # شرکت برای نمایش، Order.__str__ و بررسی شماره تلفن در Order.clean
+        return super().get_queryset(request).select_related('company_name')
+
     def save_model(self, request, obj, form, change):
         obj.total_cost = obj.amount * obj.unit_cost
         obj.remaining_payment = obj.total_cost - obj.payment
@@ -279,34 +529,11 @@ class OrderAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
             obj.remaining_payment = 0
             obj.payment = obj.total_cost
         super().save_model(request, obj, form, change)
+        # مجموع‌های شرکت با سیگنال‌های base/signals.py به‌روز می‌شوند
 
-        # Update company totals
-        if obj.company_name:
-            company = obj.company_name
-            orders = company.orders.all()
-
-            aggregated = orders.aggregate(
-                total_costs=Sum('total_cost'),
-                total_payments=Sum('payment')
-            )
-
-            company.total_orders = orders.count()
-            company.total_costs = aggregated['total_costs'] or 0
-            company.total_payments = aggregated['total_payments'] or 0
-            company.remaining_payments = company.total_costs - company.total_payments
-
-            company.save()
-
-    def delete_model(self, request, obj):
-        company = obj.company_name
-        super().delete_model(request, obj)
-        if company:
-            orders = company.orders.all()
-            company.total_orders = orders.count()
-            company.total_costs = orders.aggregate(Sum('total_cost'))['total_cost__sum'] or 0
-            company.total_payments = orders.aggregate(Sum('payment'))['payment__sum'] or 0
-            company.remaining_payments = company.total_costs - company.total_payments
-            company.save()
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic(), deferred_company_totals():
+            super().delete_queryset(request, queryset)
 
 
     def formatted_order_date(self, obj):
@@ -316,20 +543,16 @@ class OrderAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
 
 
     def changelist_view(self, request, extra_context=None):
-        response = super().changelist_view(request, extra_context=extra_context)
+        if request.method == 'POST' and '_save' in request.POST:
+            # ویرایش‌های لیست در یک تراکنش؛ مجموع شرکت‌ها یک بار در پایان
+            with transaction.atomic(), deferred_company_totals():
+                response = super().changelist_view(request, extra_context=extra_context)
+        else:
+            response = super().changelist_view(request, extra_context=extra_context)
         try:
             cl = response.context_data['cl']
-            queryset = cl.queryset
-
-            total_cost = queryset.aggregate(Sum('total_cost'))['total_cost__sum'] or 0
-            total_payment = queryset.aggregate(Sum('payment'))['payment__sum'] or 0
-            total_remaining = queryset.aggregate(Sum('remaining_payment'))['remaining_payment__sum'] or 0
-
-            response.context_data['summary'] = {
-                'total_cost': total_cost,
-                'total_payment': total_payment,
-                'total_remaining': total_remaining,
-            }
+            # یک پرس‌وجوی تجمیعی، ذخیره‌شده در cache تا ثبت سفارش بعدی
+            response.context_data['summary'] = get_order_summary(cl.queryset, cl.get_filters_params(), cl.query)
         except (AttributeError, KeyError):
             pass
 
@@ -338,6 +561,65 @@ class OrderAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     def get_list_filter(self, request):
         # override the mixin’s auto-injection of DateFieldListFilter:
         return self.list_filter
+
+    @property
+    def media(self):
+        # با تعریف media، کلاس Media خودکار اضافه نمی‌شود
+        return super().media + forms.Media(self.Media) + company_filter_media()
+
+    def get_changelist(self, request, **kwargs):
+        return OrderChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        # جستجو از طریق جدول FTS5 به جای LIKE روی همه ستون‌ها؛ در پایگاه‌داده‌های دیگر
+        # LIKE به همراه جستجوی پیشوندی روی نام و شماره نرمال‌شده
+        if not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        if not order_search_enabled():
+            matches, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+            customers = search_name_and_phone(queryset, search_term, 'customer_search', 'phone_search')
+            companies = search_name_and_phone(queryset, search_term, 'company_name__name_search', 'phone_search')
+            return matches | customers | companies, may_have_duplicates
+        return search_orders(queryset, search_term), False
+
+    def get_urls(self):
+        urls = [
+            path('import/', self.admin_site.admin_view(self.import_view), name='base_order_import'),
+        ]
+        return urls + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        form = OrderImportForm(request.POST or None, request.FILES or None)
+        errors = []
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            dry_run = form.cleaned_data['dry_run']
+            try:
+                imported, errors = import_orders(upload, upload.name, dry_run=dry_run)
+            except ValidationError as e:
+                form.add_error('file', e)
+            else:
+                if dry_run:
+                    messages.info(request, f"{farsi_comma(imported)} سفارش معتبر است.")
+                elif imported:
+                    messages.success(request, f"{farsi_comma(imported)} سفارش ثبت شد.")
+                if errors:
+                    messages.warning(request, f"{farsi_comma(len(errors))} سطر به دلیل خطا ثبت نشد.")
+                elif not dry_run:
+                    return redirect('admin:base_order_changelist')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': "ورود سفارشات از فایل",
+            'opts': self.model._meta,
+            'form': form,
+            'errors': errors[:ORDER_IMPORT_ERRORS_SHOWN],
+            'errors_hidden': max(len(errors) - ORDER_IMPORT_ERRORS_SHOWN, 0),
+        }
+        return TemplateResponse(request, 'admin/base/order/import.html', context)
     
 
     def unit_cost_display(self, obj):
@@ -375,7 +657,7 @@ class OrderAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
 class FactorAdmin(admin.ModelAdmin):
     list_filter = (
         FactorDateRangeFilter,
-        'company__name'
+        FactorCompanyFilter,
     )
     list_display = (
         "id",
@@ -386,6 +668,8 @@ class FactorAdmin(admin.ModelAdmin):
         "formatted_factor_date"
     )
     list_editable = ["total_payment"]
+    list_select_related = ('company',)
+    autocomplete_fields = ['company']
 
     def display_customer(self, obj):
         if obj.company:
@@ -410,6 +694,11 @@ class FactorAdmin(admin.ModelAdmin):
     formatted_factor_date.short_description = 'تاریخ دریافت فاکتور'
     formatted_factor_date.admin_order_field = 'factor_date'
 
+    @property
+    def media(self):
+        # با تعریف media، کلاس Media خودکار اضافه نمی‌شود
+        return super().media + forms.Media(self.Media) + company_filter_media()
+
     def save_model(self, request, obj, form, change):
         obj.total_remaining = obj.total_cost - obj.total_payment
         super().save_model(request, obj, form, change)
@@ -420,6 +709,87 @@ class FactorAdmin(admin.ModelAdmin):
             'js/comma_input.js',
             ]
 
+@admin.register(FactorJob)
+class FactorJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "status", "progress_display", "formatted_created_at", "download_link")
+    list_filter = ("status",)
+    fields = ("status", "progress_display", "formatted_created_at", "formatted_finished_at", "download_link", "error")
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        # فهرست سفارش‌ها ممکن است بسیار بزرگ باشد و نمایش داده نمی‌شود
+        return super().get_queryset(request).defer('order_ids')
+
+    def get_urls(self):
+        urls = [
+            path('<int:job_id>/progress/', self.admin_site.admin_view(self.progress_view),
+                 name='base_factorjob_progress'),
+            path('<int:job_id>/download/', self.admin_site.admin_view(self.download_view),
+                 name='base_factorjob_download'),
+        ]
+        return urls + super().get_urls()
+
+    def progress_view(self, request, job_id):
+        job = get_object_or_404(FactorJob, pk=job_id)
+        if not self.has_view_permission(request, job):
+            raise PermissionDenied
+        return JsonResponse({
+            'status': job.status,
+            'status_display': job.get_status_display(),
+            'progress': job.progress,
+            'total': job.total,
+            'download_url': self.download_url(job),
+        })
+
+    def download_view(self, request, job_id):
+        job = get_object_or_404(FactorJob, pk=job_id, status=FactorJob.DONE)
+        if not self.has_view_permission(request, job):
+            raise PermissionDenied
+        try:
+            pdf = open(factor_job_path(job), 'rb')
+        except OSError:
+            raise Http404("فایل فاکتور پیدا نشد.")
+        return FileResponse(pdf, as_attachment=True, filename=job.file_name, content_type='application/pdf')
+
+    def download_url(self, job):
+        if job.status != FactorJob.DONE:
+            return None
+        return reverse('admin:base_factorjob_download', args=[job.id])
+
+    def progress_display(self, obj):
+        return f"{farsi_comma(obj.progress)} / {farsi_comma(obj.total)}"
+    progress_display.short_description = "پیشرفت"
+
+    def download_link(self, obj):
+        url = self.download_url(obj)
+        if not url:
+            return "-"
+        return format_html('<a href="{}">دریافت فایل</a>', url)
+    download_link.short_description = "فایل"
+
+    def formatted_created_at(self, obj):
+        return obj.created_at.strftime('%Y/%m/%d - %H:%M:%S')
+    formatted_created_at.short_description = 'تاریخ ثبت'
+    formatted_created_at.admin_order_field = 'created_at'
+
+    def formatted_finished_at(self, obj):
+        if not obj.finished_at:
+            return "-"
+        return obj.finished_at.strftime('%Y/%m/%d - %H:%M:%S')
+    formatted_finished_at.short_description = 'تاریخ پایان'
+
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        extra_context = extra_context or {}
+        extra_context['progress_url'] = reverse('admin:base_factorjob_progress', args=[object_id])
+        return super().change_view(request, object_id, form_url, extra_context=extra_context)
+
+
 # Admin UI Customization
 admin.site.site_header = "مدیریت چاپخانه"
 admin.site.site_title = "پنل مدیریت چاپخانه"
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import uuid
+from tempfile import NamedTemporaryFile
+
+import jdatetime
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+
+from base.search import normalize_search_text
+
+# bump when the factor layout changes, so old cached PDFs are never served
+FACTOR_PDF_CACHE_VERSION = 1
+
+# changelist summaries and company choices are also dropped after this many seconds
+ORDER_SUMMARY_TIMEOUT = 600
+COMPANY_CHOICES_TIMEOUT = 600
+# random tokens in every summary / company choices key; replacing one invalidates them all at once
+ORDER_SUMMARY_GENERATION_KEY = 'order-summary-generation'
+COMPANY_CHOICES_GENERATION_KEY = 'company-choices-generation'
+
+
+def factor_cache_enabled():
+    return settings.FACTOR_PDF_CACHE_MAX_SIZE > 0
+
+
+def factor_content_hasher():
+    """
+    sha256 to feed with every value that ends up on the factor pages. Keys
+    are content addressed: when an order (or its company) changes, the key
+    changes and the stale PDF is simply never served again.
+    """
+    hasher = hashlib.sha256()
+    hasher.update(f"factor-pdf-v{FACTOR_PDF_CACHE_VERSION}".encode())
+    return hasher
+
+
+def factor_cache_path(key, suffix='.pdf'):
+    return os.path.join(settings.FACTOR_PDF_CACHE_DIR, key + suffix)
+
+
+def get_cached_factor_pdf(key):
+    """
+    Return (path, factor_ids) of the cached PDF for `key`, or None.
+    A hit marks the entry as recently used for eviction.
+    """
+    path = factor_cache_path(key)
+    try:
+        with open(factor_cache_path(key, '.ids')) as f:
+            factor_ids = [int(fid) for fid in f.read().split()]
+        os.utime(path)
+    except (OSError, ValueError):
+        return None
+    return path, factor_ids
+
+
+def open_factor_cache_entry():
+    """Temporary file in the cache directory to render a new entry into."""
+    os.makedirs(settings.FACTOR_PDF_CACHE_DIR, exist_ok=True)
+    return NamedTemporaryFile(dir=settings.FACTOR_PDF_CACHE_DIR, suffix='.tmp', delete=False)
+
+
+def commit_factor_cache_entry(key, tmp_path, factor_ids):
+    with open(factor_cache_path(key, '.ids'), 'w') as f:
+        f.write(' '.join(str(fid) for fid in factor_ids))
+    os.replace(tmp_path, factor_cache_path(key))
+    evict_factor_cache(keep=key)
+
+
+def discard_factor_cache_entry(tmp_path):
+    try:
+        os.remove(tmp_path)
+    except OSError:
+        pass
+
+
+def evict_factor_cache(keep=None):
+    """Remove least recently used PDFs, except `keep`, until the cache fits FACTOR_PDF_CACHE_MAX_SIZE."""
+    entries = []
+    total = 0
+    with os.scandir(settings.FACTOR_PDF_CACHE_DIR) as it:
+        for entry in it:
+            if entry.name.endswith('.pdf'):
+                stat = entry.stat()
+                total += stat.st_size
+                if entry.name != f'{keep}.pdf':
+                    entries.append((stat.st_mtime, stat.st_size, entry.name[:-len('.pdf')]))
+
+    for _, size, key in sorted(entries):
+        if total <= settings.FACTOR_PDF_CACHE_MAX_SIZE:
+            break
+        for suffix in ('.pdf', '.ids'):
+            discard_factor_cache_entry(factor_cache_path(key, suffix))
+        total -= size
+
+
+def cache_factor_pdf(chunks, key, factor_ids):
+    """Pass the PDF `chunks` through, storing them as the cache entry for `key` once complete."""
+    entry = open_factor_cache_entry()
+    try:
+        for chunk in chunks:
+            entry.write(chunk)
+            yield chunk
+    except BaseException:
+        # rendering failed or the download was cancelled
+        entry.close()
+        discard_factor_cache_entry(entry.name)
+        raise
+    entry.close()
+    commit_factor_cache_entry(key, entry.name, factor_ids)
+
+
+# --- Generations ---
+
+def cache_generation(generation_key):
+    return cache.get_or_set(generation_key, lambda: uuid.uuid4().hex, None)
+
+
+def new_cache_generation(generation_key):
+    # پس از commit، تا مقداری که در این فاصله حساب می‌شود داده قدیمی را ذخیره نکند
+    transaction.on_commit(lambda: cache.set(generation_key, uuid.uuid4().hex, None))
+
+
+# --- Order changelist summary ---
+
+def order_summary_key(filter_params, search_term):
+    """
+    Cache key of the summary for the changelist filters and search,
+    independent of their order, the sort column and the page.
+    """
+    generation = cache_generation(ORDER_SUMMARY_GENERATION_KEY)
+    params = sorted((name, sorted(values) if isinstance(values, list) else [values])
+                    for name, values in filter_params.items())
+    # فیلترهای تاریخ نسبت به امروز هستند
+    key = json.dumps([generation, str(jdatetime.date.today()), params, normalize_search_text(search_term)])
+    return 'order-summary-' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_order_summary(queryset, filter_params, search_term):
+    """Cost, payment and remaining totals of `queryset`, in one aggregate query cached per filters and search."""
+    key = order_summary_key(filter_params, search_term)
+    summary = cache.get(key)
+    if summary is None:
+        totals = queryset.order_by().aggregate(
+            total_cost=Sum('total_cost'), total_payment=Sum('payment'), total_remaining=Sum('remaining_payment'),
+        )
+        summary = {name: value or 0 for name, value in totals.items()}
+        cache.set(key, summary, ORDER_SUMMARY_TIMEOUT)
+    return summary
+
+
+def invalidate_order_summaries():
+    new_cache_generation(ORDER_SUMMARY_GENERATION_KEY)
+
+
+# --- Company filter choices ---
+
+def company_choices_key(search_term, page):
+    generation = cache_generation(COMPANY_CHOICES_GENERATION_KEY)
+    key = json.dumps([generation, normalize_search_text(search_term), page])
+    return 'company-choices-' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def invalidate_company_choices():
+    new_cache_generation(COMPANY_CHOICES_GENERATION_KEY)
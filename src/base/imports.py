@@ -0,0 +1,304 @@
+import codecs
+import csv
+import re
+import zipfile
+from datetime import datetime as gregorian_datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from xml.etree.ElementTree import ParseError, iterparse
+
+import jdatetime
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from base.cache import invalidate_order_summaries
+from base.models import Company, Order
+from base.utils import refresh_company_totals
+
+ORDER_IMPORT_BATCH_SIZE = 1000
+
+# Order fields read from an import file; total_cost and remaining_payment are always computed
+ORDER_IMPORT_FIELDS = (
+    'title', 'description', 'customer_name', 'phone_number', 'company_name', 'width', 'height',
+    'unit_cost', 'amount', 'payment', 'order_status', 'payment_status', 'order_date',
+)
+DECIMAL_IMPORT_FIELDS = ('width', 'height', 'unit_cost', 'payment')
+BOOLEAN_IMPORT_FIELDS = ('order_status', 'payment_status')
+
+TRUE_VALUES = {'1', 'true', 'yes', 'بله', 'تکمیل شده', 'انجام شده', 'پرداخت شده'}
+FALSE_VALUES = {'', '0', 'false', 'no', 'خیر', 'در حال انتظار', 'پرداخت نشده'}
+
+LATIN_DIGITS = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩', '01234567890123456789')
+# اعداد با ارقام فارسی و جداکننده هزارگان، مثل ۱۲٬۵۰۰
+NUMBER_CHARS = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩', '01234567890123456789', ',٬ ')
+
+SPREADSHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+RELATIONSHIP_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PACKAGE_RELATIONSHIP_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+
+def normalize_header(header):
+    # «قیمت واحد (ریال)» و «قیمت واحد» یک ستون هستند
+    return re.sub(r'\s*\(.*\)\s*$', '', str(header or '')).strip()
+
+
+def order_import_columns():
+    """Map of accepted header names (field names and Persian labels) to Order field names."""
+    columns = {}
+    for name in ORDER_IMPORT_FIELDS:
+        field = Order._meta.get_field(name)
+        columns[name] = name
+        columns[normalize_header(field.verbose_name)] = name
+    return columns
+
+
+# --- Readers ---
+
+def unreadable_row(row, reason):
+    # row: شماره سطری که خواندنش ممکن نشد؛ import_orders خطا را برای آن سطر ثبت می‌کند
+    return ValidationError(
+        "خواندن فایل از سطر %(row)s ممکن نشد: %(reason)s", code='unreadable', params={'row': row, 'reason': reason})
+
+
+def read_csv_rows(file):
+    row = 1
+    try:
+        # هر خط جدا رمزگشایی می‌شود تا خطا به سطر خودش نسبت داده شود
+        for values in csv.reader(codecs.iterdecode(file, 'utf-8-sig')):
+            yield values
+            row += 1
+    except UnicodeDecodeError:
+        raise unreadable_row(row, "فایل CSV باید با کدگذاری UTF-8 ذخیره شده باشد.")
+    except csv.Error as e:
+        raise unreadable_row(row, str(e))
+
+
+def xlsx_column_index(ref):
+    index = 0
+    for char in ref:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - ord('A') + 1
+    return index - 1
+
+
+def read_xlsx_shared_strings(zf):
+    try:
+        source = zf.open('xl/sharedStrings.xml')
+    except KeyError:
+        return []
+    strings = []
+    with source:
+        for event, element in iterparse(source):
+            if element.tag == SPREADSHEET_NS + 'si':
+                strings.append(''.join(t.text or '' for t in element.iter(SPREADSHEET_NS + 't')))
+                element.clear()
+    return strings
+
+
+def xlsx_first_sheet_path(zf):
+    rel_id = None
+    with zf.open('xl/workbook.xml') as source:
+        for event, element in iterparse(source):
+            if element.tag == SPREADSHEET_NS + 'sheet':
+                rel_id = element.get(RELATIONSHIP_NS + 'id')
+                break
+    with zf.open('xl/_rels/workbook.xml.rels') as source:
+        for event, element in iterparse(source):
+            if element.tag == PACKAGE_RELATIONSHIP_NS + 'Relationship' and element.get('Id') == rel_id:
+                target = element.get('Target')
+                return target.lstrip('/') if target.startswith('/') else 'xl/' + target
+    return 'xl/worksheets/sheet1.xml'
+
+
+def read_xlsx_rows(file):
+    """Yield the rows of the first sheet as lists of strings, reading the sheet XML as a stream."""
+    row = 1
+    try:
+        for values in read_xlsx_sheet(file):
+            yield values
+            row += 1
+    except zipfile.BadZipFile:
+        raise unreadable_row(row, "فایل XLSX معتبر نیست.")
+    except (KeyError, IndexError, ValueError, ParseError):
+        raise unreadable_row(row, "ساختار فایل XLSX معتبر نیست.")
+
+
+def read_xlsx_sheet(file):
+    with zipfile.ZipFile(file) as zf:
+        shared_strings = read_xlsx_shared_strings(zf)
+        with zf.open(xlsx_first_sheet_path(zf)) as source:
+            for event, element in iterparse(source):
+                if element.tag != SPREADSHEET_NS + 'row':
+                    continue
+                row = []
+                for cell in element.iter(SPREADSHEET_NS + 'c'):
+                    ref = cell.get('r')
+                    index = xlsx_column_index(ref) if ref else len(row)
+                    row.extend([''] * (index - len(row)))
+                    cell_type = cell.get('t')
+                    if cell_type == 'inlineStr':
+                        value = ''.join(t.text or '' for t in cell.iter(SPREADSHEET_NS + 't'))
+                    else:
+                        value = cell.findtext(SPREADSHEET_NS + 'v') or ''
+                        if cell_type == 's' and value:
+                            value = shared_strings[int(value)]
+                    row.append(value)
+                element.clear()
+                yield row
+
+
+def read_order_rows(file, file_name):
+    if file_name.lower().endswith('.xlsx'):
+        return read_xlsx_rows(file)
+    if file_name.lower().endswith('.csv'):
+        return read_csv_rows(file)
+    raise ValidationError("فقط فایل‌های CSV و XLSX پشتیبانی می‌شوند.")
+
+
+# --- Values ---
+
+def parse_decimal(value, label):
+    try:
+        number = Decimal(str(value).translate(NUMBER_CHARS) or 0)
+    except InvalidOperation:
+        number = None
+    # NaN و Infinity هم Decimal هستند
+    if number is None or not number.is_finite():
+        raise ValidationError(f"مقدار «{value}» در ستون «{label}» عدد نیست.")
+    return number
+
+
+def parse_boolean(value, label):
+    value = str(value).strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValidationError(f"مقدار «{value}» در ستون «{label}» نامعتبر است.")
+
+
+def parse_jalali_datetime(value, label):
+    value = str(value).strip().translate(LATIN_DIGITS)
+    if re.fullmatch(r'\d+(\.\d+)?', value):
+        # تاریخ عددی اکسل (شماره روز از ۱۸۹۹/۱۲/۳۰)
+        try:
+            return jdatetime.datetime.fromgregorian(
+                datetime=gregorian_datetime(1899, 12, 30) + timedelta(days=float(value)))
+        except (OverflowError, ValueError):
+            raise ValidationError(f"تاریخ «{value}» در ستون «{label}» وجود ندارد.")
+    match = re.fullmatch(r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})(?:\s+(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?)?', value)
+    if not match:
+        raise ValidationError(f"تاریخ «{value}» در ستون «{label}» باید به صورت ۱۴۰۳/۰۱/۲۰ باشد.")
+    try:
+        return jdatetime.datetime(*(int(part or 0) for part in match.groups()))
+    except ValueError:
+        raise ValidationError(f"تاریخ «{value}» در ستون «{label}» وجود ندارد.")
+
+
+def build_order(values, companies, now):
+    """Unsaved Order for one row of `values` (field name -> cell text), with its costs computed as in Order.save."""
+    order = Order(order_date=now)
+    for name, value in values.items():
+        label = Order._meta.get_field(name).verbose_name
+        value = str(value).strip()
+        if name in DECIMAL_IMPORT_FIELDS:
+            setattr(order, name, parse_decimal(value, label))
+        elif name == 'amount':
+            order.amount = int(parse_decimal(value or 1, label))
+        elif name in BOOLEAN_IMPORT_FIELDS:
+            setattr(order, name, parse_boolean(value, label))
+        elif name == 'order_date':
+            if value:
+                order.order_date = parse_jalali_datetime(value, label)
+        elif name == 'company_name':
+            # خروجی CSV برای مشتری بدون شرکت، نام مشتری را در ستون شرکت هم می‌نویسد
+            if value and value != str(values.get('customer_name', '')).strip():
+                matches = companies.get(value)
+                if not matches:
+                    raise ValidationError(f"شرکت «{value}» پیدا نشد.")
+                if len(matches) > 1:
+                    raise ValidationError(f"بیش از یک شرکت با نام «{value}» وجود دارد.")
+                order.company_name = matches[0]
+        else:
+            setattr(order, name, value or None)
+
+    order.total_cost = order.unit_cost * order.amount
+    order.remaining_payment = order.total_cost - order.payment
+    if order.payment_status:
+        order.remaining_payment = 0
+        order.payment = order.total_cost
+    return order
+
+
+def load_companies(names, companies):
+    """Add the companies named in `names` that are not in `companies` yet, with one query."""
+    missing = set(names) - set(companies) - {''}
+    for name in missing:
+        companies[name] = []
+    for company in Company.objects.filter(name__in=missing).order_by('id'):
+        companies[company.name].append(company)
+
+
+def numbered_rows(rows, errors):
+    """(row number, row) for `rows` from the second row on; a row that cannot be read ends them, as an error."""
+    try:
+        yield from enumerate(rows, start=2)
+    except ValidationError as e:
+        errors.append((e.params['row'], ' '.join(e.messages)))
+
+
+def import_orders(file, file_name, batch_size=ORDER_IMPORT_BATCH_SIZE, dry_run=False):
+    """
+    Read orders from the CSV or XLSX `file` and insert the valid ones.
+    Rows are validated with the Order.clean rules a batch at a time and
+    each batch is inserted with bulk_create in its own transaction; the
+    totals of the affected companies are recomputed once at the end.
+    Returns (number of imported orders, [(row number, message), ...]).
+    A file whose header cannot be read raises ValidationError; past the
+    header, reading stops at the first unreadable row, which is reported
+    as an error.
+    """
+    rows = read_order_rows(file, file_name)
+    columns = order_import_columns()
+    header = next(rows, [])
+    fields = [columns.get(normalize_header(title)) for title in header]
+    if 'title' not in fields:
+        raise ValidationError("ستون «عنوان سفارش» در سطر اول فایل پیدا نشد.")
+
+    now = jdatetime.datetime.now()
+    companies = {}
+    company_ids = set()
+    imported = 0
+    errors = []
+    rows = numbered_rows(rows, errors)
+    for batch in iter(lambda: list(islice(rows, batch_size)), []):
+        batch = [
+            (number, {name: value for name, value in zip(fields, row) if name})
+            for number, row in batch if any(str(value).strip() for value in row)
+        ]
+        load_companies((str(values.get('company_name', '')).strip() for _, values in batch), companies)
+
+        orders = []
+        for number, values in batch:
+            try:
+                order = build_order(values, companies, now)
+                order.clean_fields(exclude=['company_name'])
+                order.clean()
+            except ValidationError as e:
+                errors.append((number, ' '.join(e.messages)))
+                continue
+            # پس از clean، که شماره تلفن شرکت را روی سفارش می‌گذارد
+            order.update_search_fields()
+            orders.append(order)
+
+        if orders and not dry_run:
+            with transaction.atomic():
+                Order.objects.bulk_create(orders)
+            company_ids.update(order.company_name_id for order in orders)
+        imported += len(orders)
+
+    refresh_company_totals(company_ids)
+    if imported and not dry_run:
+        invalidate_order_summaries()
+    return imported, errors
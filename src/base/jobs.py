@@ -0,0 +1,93 @@
+import os
+import shutil
+import time
+import traceback
+
+import jdatetime
+from django.conf import settings
+
+from base.cache import cache_factor_pdf, factor_cache_enabled, get_cached_factor_pdf
+from base.models import FactorJob, Order
+from base.utils import (
+    create_factors, factor_customers, generate_safe_filename, iter_factor_groups, stream_factor_pdf,
+)
+
+# seconds between progress writes, so a large job does not write on every factor
+FACTOR_JOB_PROGRESS_INTERVAL = 1.0
+
+
+def factor_job_path(job):
+    return os.path.join(settings.FACTOR_JOB_DIR, f'{job.id}.pdf')
+
+
+def update_factor_job(job, **fields):
+    for name, value in fields.items():
+        setattr(job, name, value)
+    FactorJob.objects.filter(pk=job.pk).update(**fields)
+
+
+def claim_factor_job():
+    """Take the oldest pending job, or None. Safe with several workers running."""
+    for job in FactorJob.objects.filter(status=FactorJob.PENDING).order_by('id')[:10]:
+        if FactorJob.objects.filter(pk=job.pk, status=FactorJob.PENDING).update(status=FactorJob.RUNNING):
+            job.status = FactorJob.RUNNING
+            return job
+    return None
+
+
+def fail_interrupted_factor_jobs():
+    # کارهایی که هنگام توقف قبلی در حال اجرا بودند دیگر تمام نمی‌شوند
+    return FactorJob.objects.filter(status=FactorJob.RUNNING).update(
+        status=FactorJob.FAILED, error="تولید فاکتور با توقف سرور متوقف شد.", finished_at=jdatetime.datetime.now(),
+    )
+
+
+def process_factor_job(job):
+    """Render the factors of `job` into its file, reporting progress as each factor is drawn."""
+    queryset = Order.objects.filter(id__in=job.order_ids)
+    factors, content_key = factor_customers(queryset)
+    os.makedirs(settings.FACTOR_JOB_DIR, exist_ok=True)
+    path = factor_job_path(job)
+
+    cached = get_cached_factor_pdf(content_key) if factor_cache_enabled() else None
+    if cached:
+        cached_path, factor_ids = cached
+        shutil.copyfile(cached_path, path)
+        update_factor_job(job, total=len(factor_ids), progress=len(factor_ids))
+        return generate_safe_filename(factor_ids)
+
+    factors = create_factors(factors)
+    factor_ids = [factor.id for factor in factors]
+    update_factor_job(job, total=len(factors))
+
+    reported = time.monotonic()
+
+    def factor_done(done):
+        nonlocal reported
+        now = time.monotonic()
+        if now - reported >= FACTOR_JOB_PROGRESS_INTERVAL:
+            update_factor_job(job, progress=done)
+            reported = now
+
+    # تکه‌ها صفحه به صفحه می‌آیند؛ پیشرفت با شمار فاکتورهای کشیده‌شده ثبت می‌شود
+    chunks = stream_factor_pdf(iter_factor_groups(factors, queryset, factor_done))
+    if factor_cache_enabled():
+        chunks = cache_factor_pdf(chunks, content_key, factor_ids)
+
+    with open(path, 'wb') as out:
+        for chunk in chunks:
+            out.write(chunk)
+
+    update_factor_job(job, progress=len(factors))
+    return generate_safe_filename(factor_ids)
+
+
+def run_factor_job(job):
+    try:
+        file_name = process_factor_job(job)
+    except Exception:
+        update_factor_job(job, status=FactorJob.FAILED, error=traceback.format_exc(),
+                          finished_at=jdatetime.datetime.now())
+        return False
+    update_factor_job(job, status=FactorJob.DONE, file_name=file_name, finished_at=jdatetime.datetime.now())
+    return True
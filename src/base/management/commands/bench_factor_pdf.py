@@ -0,0 +1,64 @@
+import os
+import time
+from decimal import Decimal
+from tempfile import TemporaryFile
+
+from django.core.management.base import BaseCommand
+
+from base.models import Company, Order, Factor
+from base.utils import stream_factor_pdf, write_factor_pdf_parallel, get_factor_pool, shape_farsi_text
+
+
+def sample_factor_groups(customers, orders_per_customer):
+    """In-memory (factor, orders) groups, so the benchmark never touches the database."""
+    for c in range(1, customers + 1):
+        company = Company(id=c, name=f"شرکت نمونه {c}", phone_number="09120000000")
+        orders = []
+        for i in range(1, orders_per_customer + 1):
+            unit_cost = Decimal(150000 + i * 1000)
+            amount = i % 5 + 1
+            orders.append(Order(
+                id=c * 100000 + i,
+                title=f"سفارش چاپ بنر {i}",
+                company_name=company,
+                width=100 + i,
+                height=200,
+                unit_cost=unit_cost,
+                amount=amount,
+                total_cost=unit_cost * amount,
+                payment=Decimal(50000),
+                remaining_payment=unit_cost * amount - 50000,
+            ))
+        yield Factor(id=c, company=company), orders
+
+
+class Command(BaseCommand):
+    help = "Compare serial and process-pool rendering of factor PDFs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=300)
+        parser.add_argument('--orders', type=int, default=20, help="Orders per customer.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+
+    def handle(self, *args, **options):
+        customers, orders, workers = options['customers'], options['orders'], options['workers']
+        self.stdout.write(f"{customers} customers x {orders} orders, {workers} workers ({os.cpu_count()} CPUs)")
+
+        start = time.perf_counter()
+        size = sum(len(chunk) for chunk in stream_factor_pdf(sample_factor_groups(customers, orders)))
+        serial = time.perf_counter() - start
+        self.stdout.write(f"serial:   {serial:8.2f}s  {size / 1e6:6.1f} MB")
+        self.stdout.write(f"shaping cache: {shape_farsi_text.cache_info()}")
+
+        start = time.perf_counter()
+        pool = get_factor_pool(workers)
+        list(pool.map(int, range(workers)))  # start every worker before timing
+        self.stdout.write(f"pool start-up: {time.perf_counter() - start:.2f}s (once per server process)")
+
+        with TemporaryFile() as out:
+            start = time.perf_counter()
+            write_factor_pdf_parallel(sample_factor_groups(customers, orders), out, workers)
+            parallel = time.perf_counter() - start
+            size = out.tell()
+        self.stdout.write(f"parallel: {parallel:8.2f}s  {size / 1e6:6.1f} MB")
+        self.stdout.write(f"speedup:  {serial / parallel:8.2f}x")
@@ -0,0 +1,84 @@
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Table, TableStyle, Paragraph
+
+from base.management.commands.bench_factor_pdf import sample_factor_groups
+from base.utils import (
+    ROWS_PER_PAGE, TABLE_COL_WIDTHS, TABLE_HEADER_LABELS, TABLE_ROW_HEIGHT, TABLE_Y,
+    PAGE_WIDTH, PAGE_HEIGHT, draw_factor_table, get_farsi_text,
+)
+
+paragraph_style = ParagraphStyle(name='FarsiParagraphTable', fontName='IranSans', fontSize=9,
+                                 alignment=TA_CENTER, leading=11)
+
+table_style = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.Color(0.9, 0.9, 0.9)),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('FONTNAME', (0, 0), (-1, -1), 'IranSans'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+    ('TOPPADDING', (0, 0), (-1, -1), 4),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ('LEFTPADDING', (0, 0), (-1, -1), 2),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 2),
+    ('ALIGN', (4, 1), (-1, -1), 'RIGHT'),
+    ('ALIGN', (0, 1), (3, -1), 'CENTER'),
+])
+
+
+def draw_platypus_table(p, orders, first_row_number):
+    """The previous Paragraph-per-cell Table/TableStyle renderer, kept as the baseline."""
+    table_data = [list(reversed([Paragraph(get_farsi_text(label), paragraph_style) for label in TABLE_HEADER_LABELS]))]
+    for i, order in enumerate(orders, start=first_row_number):
+        table_data.append(list(reversed([
+            Paragraph(get_farsi_text(str(i)), paragraph_style),
+            Paragraph(get_farsi_text(order.title or ''), paragraph_style),
+            Paragraph(get_farsi_text(f"{order.width} * {order.height}"), paragraph_style),
+            Paragraph(get_farsi_text(str(order.amount)), paragraph_style),
+            Paragraph(get_farsi_text(f'{order.unit_cost:,.0f}'), paragraph_style),
+            Paragraph(get_farsi_text(f'{order.total_cost:,.0f}'), paragraph_style),
+            Paragraph(get_farsi_text(f'{order.payment:,.0f}'), paragraph_style),
+            Paragraph(get_farsi_text(f'{order.remaining_payment:,.0f}'), paragraph_style),
+        ])))
+    table = Table(table_data, colWidths=TABLE_COL_WIDTHS, rowHeights=TABLE_ROW_HEIGHT)
+    table.setStyle(table_style)
+    table_width, table_height = table.wrapOn(p, PAGE_WIDTH, PAGE_HEIGHT)
+    p.saveState()
+    table.drawOn(p, (PAGE_WIDTH - table_width) / 2, TABLE_Y - table_height)
+    p.restoreState()
+    return TABLE_Y - table_height
+
+
+class Command(BaseCommand):
+    help = "Compare the per-row cost of the direct canvas table with the Platypus Table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=200)
+
+    def handle(self, *args, **options):
+        pages = options['pages']
+        factor, orders = next(sample_factor_groups(1, ROWS_PER_PAGE))
+        rows = pages * ROWS_PER_PAGE
+        self.stdout.write(f"{pages} pages x {ROWS_PER_PAGE} rows")
+
+        results = {}
+        for name, draw in (('platypus', draw_platypus_table), ('canvas', draw_factor_table)):
+            p = canvas.Canvas(BytesIO(), pagesize=A4, initialFontName='IranSans')
+            draw(p, orders, 1)  # warm the shaping caches for both renderers alike
+            p.showPage()
+            start = time.perf_counter()
+            for page in range(pages):
+                draw(p, orders, 1)
+                p.showPage()
+            results[name] = time.perf_counter() - start
+            self.stdout.write(f"{name:9} {results[name]:7.2f}s  {results[name] / rows * 1e6:8.1f} us/row")
+
+        self.stdout.write(f"speedup:  {results['platypus'] / results['canvas']:7.2f}x")
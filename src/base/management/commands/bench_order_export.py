@@ -0,0 +1,59 @@
+import time
+import tracemalloc
+from decimal import Decimal
+
+import jdatetime
+from django.core.management.base import BaseCommand
+
+from base.utils import (
+    ORDER_EXPORT_CHUNK_SIZE, ORDER_EXPORT_HEADERS, ORDER_XLSX_COL_WIDTHS, ORDER_XLSX_HEADERS,
+    iter_order_xlsx_rows, iter_orders_csv,
+)
+from base.xlsx import stream_xlsx
+
+
+def sample_export_chunks(rows):
+    """In-memory ORDER_EXPORT_FIELDS rows, so the benchmark measures the writers only."""
+    order_date = jdatetime.datetime(1403, 1, 1, 10, 30)
+    chunk = []
+    for i in range(rows):
+        unit_cost = Decimal(150000 + i % 1000)
+        chunk.append((
+            f"سفارش چاپ بنر {i}", "چاپ روی فلکس با پایه", f"مشتری {i % 500}", f"شرکت نمونه {i % 300}" if i % 2 else None,
+            unit_cost, unit_cost * 3, Decimal(50000), unit_cost * 3 - 50000, bool(i % 3), order_date,
+        ))
+        if len(chunk) == ORDER_EXPORT_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = "Measure CSV and streaming XLSX order export throughput."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        exports = {
+            'csv': lambda: iter_orders_csv(sample_export_chunks(rows)),
+            'xlsx': lambda: stream_xlsx(ORDER_XLSX_HEADERS, iter_order_xlsx_rows(sample_export_chunks(rows)),
+                                        col_widths=ORDER_XLSX_COL_WIDTHS),
+        }
+        self.stdout.write(f"{rows} rows, {len(ORDER_EXPORT_HEADERS)} columns")
+
+        for name, export in exports.items():
+            start = time.perf_counter()
+            size = sum(len(chunk) for chunk in export())
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"{name:5} {elapsed:8.2f}s  {rows / elapsed:10,.0f} rows/s  {size / 1e6:8.1f} MB")
+
+        # memory on a smaller run, tracemalloc slows everything down
+        sample = min(rows, 100000)
+        tracemalloc.start()
+        for chunk in stream_xlsx(ORDER_XLSX_HEADERS, iter_order_xlsx_rows(sample_export_chunks(sample))):
+            pass
+        self.stdout.write(f"xlsx peak memory for {sample} rows: {tracemalloc.get_traced_memory()[1] / 1e6:.1f} MB")
+        tracemalloc.stop()
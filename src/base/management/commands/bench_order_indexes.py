@@ -0,0 +1,161 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+import jdatetime
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from base.models import Company, Factor, Order
+
+BENCH_DB = 'bench'
+
+BENCH_PRODUCTS = ['بنر', 'استیکر', 'کارت ویزیت', 'بروشور', 'تراکت', 'لیبل', 'فلکس', 'پوستر', 'سربرگ', 'پاکت']
+BENCH_SIZES = ['A4', 'A5', 'A3', '100x200', '50x70', 'رول']
+
+
+@contextmanager
+def bench_database(**settings):
+    """
+    A throwaway migrated SQLite database under the BENCH_DB alias, so the
+    real database is never touched. `settings` override those of the
+    default database, e.g. ENGINE and OPTIONS.
+    """
+    directory = tempfile.mkdtemp()
+    connections.databases[BENCH_DB] = {
+        **connections.databases['default'], **settings, 'NAME': os.path.join(directory, 'bench.sqlite3'),
+    }
+    try:
+        call_command('migrate', database=BENCH_DB, verbosity=0)
+        yield
+    finally:
+        connections[BENCH_DB].close()
+        # the next bench database may use another engine
+        del connections[BENCH_DB]
+        del connections.databases[BENCH_DB]
+        shutil.rmtree(directory)
+
+
+def seed_bench_orders(orders, companies, seed=1):
+    """
+    Add `orders` orders spread over three years to the bench database, and
+    factors for them, creating `companies` companies on the first call.
+    """
+    if not Company.objects.using(BENCH_DB).exists():
+        bench_companies = [Company(name=f'شرکت {i}') for i in range(companies)]
+        for company in bench_companies:
+            company.update_search_fields()
+        Company.objects.using(BENCH_DB).bulk_create(bench_companies, batch_size=1000)
+    company_ids = list(Company.objects.using(BENCH_DB).values_list('id', flat=True))
+
+    rng = random.Random(seed)
+    now = jdatetime.datetime.now(timezone.get_current_timezone())
+    batch = []
+    for i in range(orders):
+        company_id = rng.choice(company_ids) if rng.random() < 0.7 else None
+        order = Order(
+            title=f'{rng.choice(BENCH_PRODUCTS)} {rng.choice(BENCH_SIZES)} {i}', company_name_id=company_id,
+            customer_name=None if company_id else f'مشتری {rng.randrange(5000)}',
+            phone_number=None if company_id else f'0912{rng.randrange(10 ** 7):07}',
+            width=100, height=200, unit_cost=1000, amount=1, total_cost=1000, remaining_payment=1000,
+            # three years of orders, most of them done and paid
+            order_date=now - timedelta(minutes=rng.randrange(3 * 365 * 24 * 60)),
+            order_status=rng.random() < 0.9, payment_status=rng.random() < 0.8,
+        )
+        order.update_search_fields()
+        batch.append(order)
+        if len(batch) == 20000:
+            Order.objects.using(BENCH_DB).bulk_create(batch)
+            batch = []
+    Order.objects.using(BENCH_DB).bulk_create(batch)
+
+    Factor.objects.using(BENCH_DB).bulk_create([
+        Factor(company_id=rng.choice(company_ids), factor_date=now - timedelta(minutes=rng.randrange(3 * 365 * 24 * 60)))
+        for _ in range(orders // 20)
+    ], batch_size=20000)
+    with connections[BENCH_DB].cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def admin_queries(db, company_name, month_start, month_end):
+    """The queries OrderAdmin/FactorAdmin changelists run, by filter, as (name, queryset)."""
+    orders = Order.objects.using(db)
+    factors = Factor.objects.using(db)
+    page = slice(0, 100)
+    # the changelist appends -pk to make the ordering deterministic
+    ordering = ('-order_date', '-pk')
+    return [
+        ('orders: default page', orders.order_by(*ordering)[page]),
+        ('orders: this month', orders.filter(order_date__range=(month_start, month_end)).order_by(*ordering)[page]),
+        ('orders: this month count', orders.filter(order_date__range=(month_start, month_end)).order_by()),
+        ('orders: pending', orders.filter(order_status=False).order_by(*ordering)[page]),
+        ('orders: pending count', orders.filter(order_status=False).order_by()),
+        ('orders: unpaid', orders.filter(payment_status=False).order_by(*ordering)[page]),
+        ('orders: done+unpaid this month', orders.filter(
+            order_status=True, payment_status=False, order_date__range=(month_start, month_end),
+        ).order_by(*ordering)[page]),
+        ('orders: company', orders.filter(company_name__name=company_name).order_by(*ordering)[page]),
+        ('factors: default page', factors.order_by('-factor_date', '-pk')[page]),
+        ('factors: this month', factors.filter(factor_date__range=(month_start, month_end))
+         .order_by('-factor_date', '-pk')[page]),
+        ('factors: company', factors.filter(company__name=company_name).order_by('-factor_date', '-pk')[page]),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Compare query plans and timings of the admin changelist queries without and with the indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000000)
+        parser.add_argument('--companies', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per query; the best is reported.")
+
+    def handle(self, *args, **options):
+        with bench_database():
+            start = time.perf_counter()
+            seed_bench_orders(options['orders'], options['companies'])
+            self.stdout.write(f"seeded {options['orders']} orders in {time.perf_counter() - start:.0f}s")
+
+            now = jdatetime.datetime.now(timezone.get_current_timezone())
+            month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            queries = admin_queries(BENCH_DB, 'شرکت 7', month_start, now)
+
+            indexes = [(model, index) for model in (Order, Factor) for index in model._meta.indexes]
+            with connections[BENCH_DB].schema_editor() as editor:
+                for model, index in indexes:
+                    editor.remove_index(model, index)
+            before = self.measure(queries, options['repeat'])
+            with connections[BENCH_DB].schema_editor() as editor:
+                for model, index in indexes:
+                    editor.add_index(model, index)
+            after = self.measure(queries, options['repeat'])
+
+            for name, _ in queries:
+                (plan_before, time_before), (plan_after, time_after) = before[name], after[name]
+                self.stdout.write(f"\n{name}: {time_before * 1000:9.1f} ms -> {time_after * 1000:9.1f} ms "
+                                  f"({time_before / time_after:.0f}x)")
+                self.stdout.write(f"  before: {plan_before}")
+                self.stdout.write(f"  after:  {plan_after}")
+
+    def measure(self, queries, repeat):
+        results = {}
+        with connections[BENCH_DB].cursor() as cursor:
+            cursor.execute('ANALYZE')
+        for name, queryset in queries:
+            count = name.endswith('count')
+            plan = '; '.join(line.split(' ', 3)[-1] for line in queryset.explain().splitlines())
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                # a fresh clone each run, so the result cache is never hit
+                queryset.count() if count else list(queryset.all())
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results[name] = (plan, best)
+        return results
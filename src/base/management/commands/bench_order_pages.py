@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from base.management.commands.bench_order_indexes import BENCH_DB, bench_database, seed_bench_orders
+from base.models import Order
+from base.pagination import ORDER_COUNT_LIMIT, EstimatedCountPaginator, KEYSET_ORDERING, keyset_page
+
+
+class Command(BaseCommand):
+    help = "Compare OFFSET and keyset paging of the order changelist, and full and estimated counts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000000)
+        parser.add_argument('--per-page', type=int, default=100)
+        parser.add_argument('--pages', default='1,100,1000,5000', help="Comma separated page numbers.")
+
+    def handle(self, *args, **options):
+        per_page = options['per_page']
+        with bench_database():
+            seed_bench_orders(options['orders'], 2000)
+            orders = Order.objects.using(BENCH_DB).order_by(*KEYSET_ORDERING)
+            pending = orders.filter(order_status=False)
+
+            for name, queryset in (('all', orders), ('pending', pending)):
+                start = time.perf_counter()
+                count = queryset.count()
+                full = time.perf_counter() - start
+                start = time.perf_counter()
+                EstimatedCountPaginator(queryset, per_page).count
+                estimated = time.perf_counter() - start
+                self.stdout.write(f"{name} count ({count}): COUNT(*) {full * 1000:.1f} ms, "
+                                  f"capped at {ORDER_COUNT_LIMIT} {estimated * 1000:.1f} ms")
+
+            # walk the keyset pages once, keeping the cursor of each page to measure
+            pages = sorted(int(page) for page in options['pages'].split(','))
+            cursors = {}
+            after = None
+            for number in range(1, pages[-1] + 1):
+                if number in pages:
+                    cursors[number] = after
+                page, _, has_next = keyset_page(orders, per_page, after)
+                if not has_next:
+                    break
+                last = list(page)[-1]
+                after = (last.order_date, last.pk)
+
+            self.stdout.write("page           OFFSET        keyset")
+            for number, after in cursors.items():
+                start = time.perf_counter()
+                offset_page = list(orders[(number - 1) * per_page:number * per_page])
+                offset = time.perf_counter() - start
+                start = time.perf_counter()
+                page, _, _ = keyset_page(orders, per_page, after)
+                keyset = time.perf_counter() - start
+                assert list(page) == offset_page
+                self.stdout.write(f"{number:6} {offset * 1000:12.1f} ms {keyset * 1000:10.1f} ms")
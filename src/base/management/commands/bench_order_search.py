@@ -0,0 +1,63 @@
+import time
+
+from django.contrib import admin
+from django.core.management.base import BaseCommand
+
+from base.management.commands.bench_order_indexes import BENCH_DB, bench_database, seed_bench_orders
+from base.models import Company, Order
+from base.search import search_name_and_phone, search_orders
+
+SEARCH_TERMS = ['بنر', 'پوستر A3', 'کار', 'شرکت 17', 'مشتری 4321', '123456']
+# company autocomplete and phone lookups, typed with Arabic letters and Persian digits
+PREFIX_TERMS = ['شركت 17', '۰۹۱۲۳۴']
+
+
+class Command(BaseCommand):
+    help = "Compare LIKE and FTS5 order search latency as the order table grows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100000,300000,1000000', help="Comma separated order counts.")
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per search; the best is reported.")
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        order_admin = admin.site._registry[Order]
+        with bench_database():
+            seeded = 0
+            for size in sizes:
+                seed_bench_orders(size - seeded, 2000, seed=size)
+                seeded = size
+                self.stdout.write(f"\n{size} orders         LIKE page+count      FTS5 page+count   matches")
+                orders = Order.objects.using(BENCH_DB)
+                for term in SEARCH_TERMS:
+                    like, _ = admin.ModelAdmin.get_search_results(order_admin, None, orders, term)
+                    like = like.order_by('-order_date', '-pk')
+                    fts = search_orders(orders, term).order_by('search_rank', '-order_date', '-pk')
+                    like_time = self.measure(like, options['repeat'])
+                    fts_time = self.measure(fts, options['repeat'])
+                    self.stdout.write(f"  {term:16} {like_time * 1000:12.1f} ms {fts_time * 1000:14.1f} ms "
+                                      f"{fts.count():9}")
+
+                self.stdout.write("                 icontains            prefix on *_search")
+                for model, field, term in ((Company, 'name', PREFIX_TERMS[0]), (Order, 'phone_number', PREFIX_TERMS[1])):
+                    queryset = model.objects.using(BENCH_DB)
+                    like = queryset.filter(**{f'{field}__icontains': term})
+                    if model is Company:
+                        prefix = search_name_and_phone(queryset, term, 'name_search', 'phone_search')
+                    else:
+                        prefix = search_name_and_phone(queryset, term, 'customer_search', 'phone_search')
+                    like_time = self.measure(like, options['repeat'])
+                    prefix_time = self.measure(prefix, options['repeat'])
+                    self.stdout.write(f"  {term:16} {like_time * 1000:12.1f} ms {prefix_time * 1000:14.1f} ms "
+                                      f"{like.count():4} / {prefix.count()}")
+
+    def measure(self, queryset, repeat):
+        # what the changelist runs: the first page and the result count
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(queryset.all()[:100])
+            queryset.count()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
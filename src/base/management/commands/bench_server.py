@@ -0,0 +1,84 @@
+import http.client
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def fetch(port, path, count):
+    """Request `path` `count` times over one keep-alive connection; returns the latencies."""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        connection.request('GET', path)
+        response = connection.getresponse()
+        response.read()
+        if response.status != 200:
+            raise RuntimeError(f"{path} answered {response.status}")
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+    return latencies
+
+
+def wait_until_serving(port, path, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            fetch(port, path, 1)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f"the server did not answer on port {port} in {timeout}s")
+
+
+class Command(BaseCommand):
+    help = ("Start run_waitress.py with each number of workers and load it with concurrent keep-alive "
+            "clients, comparing requests per second. The clients run in their own processes on the "
+            "same machine, so leave them cores to run on.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', default='1,2,4', help="Comma separated numbers of worker processes.")
+        parser.add_argument('--threads', type=int, default=settings.SERVER_THREADS)
+        parser.add_argument('--clients', type=int, default=16, help="Concurrent client connections.")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per client.")
+        # the login page renders a template without touching the database
+        parser.add_argument('--path', default='/admin/login/')
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        path, clients = options['path'], options['clients']
+        self.stdout.write(f"{os.cpu_count()} CPUs, {clients} clients x {options['requests']} requests of {path}")
+        self.stdout.write("workers  threads   requests/s   median      p95")
+        baseline = None
+        for i, workers in enumerate(int(n) for n in options['workers'].split(',')):
+            # a port of its own, as the last server's workers may still be closing theirs
+            port = options['port'] + i
+            server = subprocess.Popen([
+                sys.executable, os.path.join(settings.BASE_DIR, 'run_waitress.py'),
+                '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers),
+                '--threads', str(options['threads']), '--no-factor-worker',
+            ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_until_serving(port, path)
+                with multiprocessing.get_context('spawn').Pool(clients) as pool:
+                    # warm up every worker before measuring
+                    pool.starmap(fetch, [(port, path, 5)] * clients)
+                    start = time.perf_counter()
+                    results = pool.starmap(fetch, [(port, path, options['requests'])] * clients)
+                    elapsed = time.perf_counter() - start
+            finally:
+                server.terminate()
+                server.wait()
+
+            latencies = sorted(latency for result in results for latency in result)
+            throughput = len(latencies) / elapsed
+            baseline = baseline or throughput
+            self.stdout.write(
+                f"{workers:7} {options['threads']:8} {throughput:12.0f} {statistics.median(latencies) * 1000:8.1f} ms "
+                f"{latencies[int(len(latencies) * 0.95)] * 1000:7.1f} ms   x{throughput / baseline:.2f}")
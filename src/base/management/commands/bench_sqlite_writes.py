@@ -0,0 +1,132 @@
+import statistics
+import threading
+import time
+from datetime import timedelta
+
+import jdatetime
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from base.management.commands.bench_order_indexes import BENCH_DB, bench_database, seed_bench_orders
+from base.models import Company, Order
+from base.pagination import KEYSET_ORDERING, keyset_page
+
+# (name, overrides of the default database settings)
+BENCH_MODES = [
+    ('rollback journal', {'ENGINE': 'django.db.backends.sqlite3', 'OPTIONS': {}}),
+    ('WAL, IMMEDIATE', {'ENGINE': 'django.db.backends.sqlite3', 'OPTIONS': settings.SQLITE_WAL_OPTIONS}),
+    ('WAL + serialized writes', {'ENGINE': 'base.sqlite', 'OPTIONS': settings.SQLITE_WAL_OPTIONS}),
+]
+
+
+def save_order(clerk, number, company_ids):
+    """What saving an order in the admin writes: the order, its company's totals and the session."""
+    company_id = company_ids[(clerk * 7919 + number) % len(company_ids)]
+    with transaction.atomic(using=BENCH_DB):
+        company = Company.objects.using(BENCH_DB).only('phone_number').get(pk=company_id)
+        order = Order(
+            title=f'بنر {clerk}-{number}', company_name_id=company_id, phone_number=company.phone_number,
+            width=100, height=200, unit_cost=1000, amount=1, total_cost=1000, remaining_payment=1000,
+            order_date=jdatetime.datetime.now(timezone.get_current_timezone()),
+        )
+        order.update_search_fields()
+        # بدون سیگنال‌ها، که روی پایگاه‌داده پیش‌فرض می‌نویسند
+        Order.objects.using(BENCH_DB).bulk_create([order])
+        Company.objects.using(BENCH_DB).filter(pk=company_id).update(
+            total_orders=F('total_orders') + 1, total_costs=F('total_costs') + 1000,
+            remaining_payments=F('remaining_payments') + 1000,
+        )
+    # the session middleware saves the session after the view, outside its transaction
+    Session.objects.using(BENCH_DB).filter(session_key=f'clerk-{clerk}').update(
+        expire_date=timezone.now() + timedelta(days=14))
+
+
+class Command(BaseCommand):
+    help = ("Run clerks saving orders and readers paging the order changelist on parallel threads, "
+            "as Waitress does, against Django's SQLite backend and base.sqlite in WAL mode.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clerks', type=int, default=8, help="Threads saving orders.")
+        parser.add_argument('--readers', type=int, default=4, help="Threads reading changelist pages.")
+        parser.add_argument('--writes', type=int, default=200, help="Orders saved by each clerk.")
+        parser.add_argument('--orders', type=int, default=50000, help="Orders in the database beforehand.")
+
+    def handle(self, *args, **options):
+        for name, database in BENCH_MODES:
+            with bench_database(**database):
+                seed_bench_orders(options['orders'], 500)
+                expire_date = timezone.now() + timedelta(days=14)
+                Session.objects.using(BENCH_DB).bulk_create([
+                    Session(session_key=f'clerk-{clerk}', session_data='', expire_date=expire_date)
+                    for clerk in range(options['clerks'])
+                ])
+                with connections[BENCH_DB].cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    journal_mode = cursor.fetchone()[0]
+                result = self.run(options['clerks'], options['readers'], options['writes'])
+            self.report(f"{name} ({journal_mode})", result)
+
+    def run(self, clerks, readers, writes):
+        company_ids = list(Company.objects.using(BENCH_DB).values_list('id', flat=True))
+        seeded = Order.objects.using(BENCH_DB).count()
+        latencies = []
+        errors = []
+        reads = [0]
+        writing = threading.Event()
+        writing.set()
+
+        def clerk(number):
+            try:
+                for i in range(writes):
+                    start = time.perf_counter()
+                    try:
+                        save_order(number, i, company_ids)
+                    except OperationalError as e:
+                        errors.append(str(e))
+                    else:
+                        latencies.append(time.perf_counter() - start)
+            finally:
+                connections[BENCH_DB].close()
+
+        def reader():
+            orders = Order.objects.using(BENCH_DB).order_by(*KEYSET_ORDERING)
+            try:
+                while writing.is_set():
+                    try:
+                        list(keyset_page(orders, 100)[0])
+                        reads[0] += 1
+                    except OperationalError as e:
+                        errors.append(str(e))
+            finally:
+                connections[BENCH_DB].close()
+
+        clerk_threads = [threading.Thread(target=clerk, args=(number,)) for number in range(clerks)]
+        reader_threads = [threading.Thread(target=reader) for _ in range(readers)]
+        start = time.perf_counter()
+        for thread in clerk_threads + reader_threads:
+            thread.start()
+        for thread in clerk_threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        writing.clear()
+        for thread in reader_threads:
+            thread.join()
+
+        saved = Order.objects.using(BENCH_DB).count() - seeded
+        return elapsed, latencies, errors, reads[0], saved
+
+    def report(self, name, result):
+        elapsed, latencies, errors, reads, saved = result
+        latencies.sort()
+        self.stdout.write(f"\n{name}")
+        self.stdout.write(f"  saved {saved} orders in {elapsed:.1f}s: {saved / elapsed:.0f} orders/s, "
+                          f"{reads / elapsed:.0f} pages read/s")
+        if latencies:
+            self.stdout.write(
+                f"  save latency: median {statistics.median(latencies) * 1000:.1f} ms, "
+                f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f} ms, max {latencies[-1] * 1000:.0f} ms")
+        self.stdout.write(f"  lock errors: {len(errors)}" + (f" ({errors[0]})" if errors else ""))
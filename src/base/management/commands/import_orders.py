@@ -0,0 +1,32 @@
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from base.imports import ORDER_IMPORT_BATCH_SIZE, import_orders
+
+
+class Command(BaseCommand):
+    help = "Import orders from a CSV or XLSX file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=ORDER_IMPORT_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help="Only validate the rows.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as file:
+                imported, errors = import_orders(
+                    file, options['path'], batch_size=options['batch_size'], dry_run=options['dry_run'],
+                )
+        except OSError as e:
+            raise CommandError(e)
+        except ValidationError as e:
+            raise CommandError(' '.join(e.messages))
+
+        for number, message in errors:
+            self.stderr.write(f"row {number}: {message}")
+        verb = "valid" if options['dry_run'] else "imported"
+        self.stdout.write(f"{imported} orders {verb}, {len(errors)} rows rejected in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from base.models import Company, Factor, Order
+
+COMPANY_TOTAL_FIELDS = ('total_orders', 'total_costs', 'total_payments', 'remaining_payments')
+
+
+class Command(BaseCommand):
+    help = "Recompute Company totals from their orders and Factor.total_remaining, fixing rows that drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report the drift.")
+        parser.add_argument('--show', type=int, default=20, help="Number of drifted rows to list.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        with transaction.atomic():
+            self.reconcile_companies(options['dry_run'], options['show'])
+            self.reconcile_factors(options['dry_run'], options['show'])
+        self.stdout.write(f"done in {time.perf_counter() - start:.2f}s")
+
+    def reconcile_companies(self, dry_run, show):
+        # یک پرس‌وجوی گروهی روی همه سفارش‌ها
+        expected = {
+            company_id: (count, costs or 0, payments or 0, (costs or 0) - (payments or 0))
+            for company_id, count, costs, payments in Order.objects.filter(company_name__isnull=False)
+            .values('company_name').annotate(count=Count('id'), costs=Sum('total_cost'), payments=Sum('payment'))
+            .values_list('company_name', 'count', 'costs', 'payments').order_by()
+        }
+
+        changed = []
+        drift = [0] * len(COMPANY_TOTAL_FIELDS)
+        checked = 0
+        for company in Company.objects.only('name', *COMPANY_TOTAL_FIELDS).order_by('id').iterator(chunk_size=2000):
+            checked += 1
+            current = tuple(getattr(company, name) for name in COMPANY_TOTAL_FIELDS)
+            totals = expected.get(company.id, (0, 0, 0, 0))
+            if current == totals:
+                continue
+            for i, (old, new) in enumerate(zip(current, totals)):
+                drift[i] += new - old
+            if len(changed) < show:
+                self.stdout.write(f"  company {company.id} {company.name}: " + ", ".join(
+                    f"{name} {old} -> {new}"
+                    for name, old, new in zip(COMPANY_TOTAL_FIELDS, current, totals) if old != new
+                ))
+            for name, value in zip(COMPANY_TOTAL_FIELDS, totals):
+                setattr(company, name, value)
+            changed.append(company)
+
+        self.stdout.write(
+            f"companies: {checked} checked, {len(changed)} drifted; "
+            + ", ".join(f"{name} {value:+}" for name, value in zip(COMPANY_TOTAL_FIELDS, drift))
+        )
+        if changed and not dry_run:
+            Company.objects.bulk_update(changed, COMPANY_TOTAL_FIELDS, batch_size=500)
+
+    def reconcile_factors(self, dry_run, show):
+        drifted = Factor.objects.filter(~Q(total_remaining=F('total_cost') - F('total_payment')))
+        for factor_id, remaining, cost, payment in drifted.values_list(
+                'id', 'total_remaining', 'total_cost', 'total_payment')[:show]:
+            self.stdout.write(f"  factor {factor_id}: total_remaining {remaining} -> {cost - payment}")
+
+        if dry_run:
+            self.stdout.write(f"factors: {drifted.count()} drifted")
+            return
+        fixed = drifted.update(total_remaining=F('total_cost') - F('total_payment'))
+        self.stdout.write(f"factors: {fixed} drifted")
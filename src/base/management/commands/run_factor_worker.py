@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from base.jobs import claim_factor_job, fail_interrupted_factor_jobs, run_factor_job
+
+
+class Command(BaseCommand):
+    help = "Render queued factor jobs in the background."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds between polls of an empty queue.")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        failed = fail_interrupted_factor_jobs()
+        if failed:
+            self.stdout.write(f"marked {failed} interrupted job(s) as failed")
+
+        while True:
+            close_old_connections()
+            job = claim_factor_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+                continue
+
+            self.stdout.write(f"job {job.id}: {len(job.order_ids)} orders")
+            started = time.perf_counter()
+            ok = run_factor_job(job)
+            self.stdout.write(f"job {job.id}: {'done' if ok else 'failed'} in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,22 @@
+from base.sqlite.base import deferred_transactions
+
+# درخواست‌هایی که قرار نیست چیزی بنویسند
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class DeferredTransactionsMiddleware:
+    """
+    Begin the transactions of GET requests DEFERRED (base.sqlite), so the
+    admin change and delete pages, which Django renders inside atomic()
+    even when only showing a form, do not hold the write lock while they
+    render. Other requests keep beginning IMMEDIATE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method in SAFE_METHODS:
+            with deferred_transactions():
+                return self.get_response(request)
+        return self.get_response(request)
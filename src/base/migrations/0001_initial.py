@@ -0,0 +1,81 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:48
+
+import django.db.models.deletion
+import django_jalali.db.models
+import jdatetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Company',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='نام شرکت را وارد کنید.', max_length=255, verbose_name='نام شرکت')),
+                ('address', models.TextField(blank=True, help_text='آدرس شرکت را وارد کنید (اختیاری).', max_length=400, null=True, verbose_name='آدرس')),
+                ('phone_number', models.CharField(blank=True, help_text='شماره تلفن شرکت را وارد کنید (اختیاری).', max_length=13, null=True, verbose_name='شماره تلفن')),
+                ('total_orders', models.DecimalField(decimal_places=0, default=0, help_text='تعداد کل سفارشات ثبت شده برای شرکت.', max_digits=15, verbose_name='تعداد کل سفارشات')),
+                ('total_payments', models.DecimalField(decimal_places=0, default=0, help_text='مجموع مبالغ پرداخت شده توسط شرکت (ریال).', max_digits=15, verbose_name='مجموع پرداخت\u200cها (ریال)')),
+                ('total_costs', models.DecimalField(decimal_places=0, default=0, help_text='مجموع هزینه\u200cهای شرکت (ریال).', max_digits=15, verbose_name='مجموع هزینه\u200cها (ریال)')),
+                ('remaining_payments', models.DecimalField(decimal_places=0, default=0, editable=False, help_text='مبلغ پرداخت\u200cنشده توسط شرکت (ریال).', max_digits=15, verbose_name='پرداخت\u200c باقی\u200cمانده (ریال)')),
+            ],
+            options={
+                'verbose_name': 'شرکت',
+                'verbose_name_plural': 'شرکت\u200cها',
+                'ordering': ['name'],
+                'managed': True,
+            },
+        ),
+        migrations.CreateModel(
+            name='Factor',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False, verbose_name='شماره فاکتور')),
+                ('customer', models.CharField(blank=True, max_length=255, null=True, verbose_name='نام مشتری')),
+                ('total_payment', models.DecimalField(decimal_places=0, default=0, help_text='مجموع مبالغ پرداخت شده توسط شرکت (ریال).', max_digits=15, verbose_name='مجموع پرداخت\u200cها (ریال)')),
+                ('total_remaining', models.DecimalField(decimal_places=0, default=0, help_text='مبلغ پرداخت\u200cنشده  (ریال).', max_digits=15, verbose_name='پرداخت\u200c باقی\u200cمانده (ریال)')),
+                ('total_cost', models.DecimalField(decimal_places=0, default=0, help_text='مجموع هزینه\u200cها (ریال).', max_digits=15, verbose_name='مجموع هزینه\u200cها (ریال)')),
+                ('factor_date', django_jalali.db.models.jDateTimeField(default=jdatetime.datetime.now, help_text='تاریخ ایجاد فاکتور (به صورت خودکار ثبت می\u200cشود).', verbose_name='تاریخ ایجاد')),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='base.company', verbose_name='نام شرکت')),
+            ],
+            options={
+                'verbose_name': 'فاکتور',
+                'verbose_name_plural': 'فاکتورها',
+                'ordering': ['-factor_date'],
+                'managed': True,
+            },
+        ),
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(help_text='عنوان سفارش را وارد کنید.', max_length=255, verbose_name='عنوان سفارش')),
+                ('description', models.TextField(blank=True, help_text='توضیحات مربوط به سفارش را وارد کنید (اختیاری).', null=True, verbose_name='توضیحات')),
+                ('customer_name', models.CharField(blank=True, help_text='نام مشتری را وارد کنید (در صورت عدم انتخاب شرکت).', max_length=255, null=True, verbose_name='نام مشتری')),
+                ('phone_number', models.CharField(blank=True, help_text='درصورت ثبت نام مشتری شماره تلفن مشتری را وارد کنید (اختیاری).', max_length=13, null=True, verbose_name='شماره تلفن')),
+                ('width', models.DecimalField(decimal_places=0, default=0, help_text='عرض سفارش را وارد کنید (سانتی\u200cمتر).', max_digits=5, verbose_name='عرض (سانتی\u200cمتر)')),
+                ('height', models.DecimalField(decimal_places=0, default=0, help_text='ارتفاع سفارش را وارد کنید (سانتی\u200cمتر).', max_digits=5, verbose_name='ارتفاع (سانتی\u200cمتر)')),
+                ('unit_cost', models.DecimalField(decimal_places=0, default=0, help_text='هزینه سفارش را وارد کنید (ریال).', max_digits=15, verbose_name='قیمت واحد (ریال)')),
+                ('total_cost', models.DecimalField(decimal_places=0, default=0, max_digits=15, verbose_name='قیمت کل (ریال)')),
+                ('amount', models.PositiveIntegerField(default=1, help_text='تعداد را وارد کنید. ', verbose_name='تعداد')),
+                ('payment', models.DecimalField(decimal_places=0, default=0, help_text='مبلغ پرداخت شده برای سفارش را وارد کنید (ریال).', max_digits=15, verbose_name='مبلغ پرداختی (ریال)')),
+                ('remaining_payment', models.DecimalField(decimal_places=0, default=0, help_text='مبلغ باقی\u200cمانده برای پرداخت سفارش (ریال).', max_digits=15, verbose_name='پرداخت باقی\u200cمانده (ریال)')),
+                ('order_status', models.BooleanField(default=False, help_text='وضعیت انجام سفارش را مشخص کنید.', verbose_name='وضعیت سفارش')),
+                ('payment_status', models.BooleanField(default=False, help_text='در صورت تایید مبلغ پرداختی برابر با هزینه کل ثبت میشود. ', verbose_name='وضعیت پرداخت')),
+                ('order_date', django_jalali.db.models.jDateTimeField(default=jdatetime.datetime.now, help_text='تاریخ ثبت سفارش (به صورت خودکار ثبت می\u200cشود).', verbose_name='تاریخ ایجاد')),
+                ('company_name', models.ForeignKey(blank=True, help_text='شرکت مربوط به سفارش را انتخاب کنید (در صورت عدم وارد کردن نام مشتری).', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='base.company', verbose_name='نام شرکت')),
+            ],
+            options={
+                'verbose_name': 'سفارش',
+                'verbose_name_plural': 'سفارشات',
+                'ordering': ['-order_date'],
+                'managed': True,
+            },
+        ),
+    ]
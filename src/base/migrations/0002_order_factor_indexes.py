@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='factor',
+            index=models.Index(fields=['factor_date'], name='factor_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='factor',
+            index=models.Index(fields=['company', 'factor_date'], name='factor_company_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['order_date'], name='order_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('order_status', False)), fields=['order_date'], name='order_pending_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('payment_status', False)), fields=['order_date'], name='order_unpaid_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['company_name', 'order_date'], name='order_company_date_idx'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+from django.db import migrations
+
+# title, description, customer name and company name of every order, with
+# the order id as rowid. unicode61 splits Persian text on spaces, ZWNJ and
+# punctuation; the prefix indexes keep partly typed words fast.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE base_order_fts USING fts5(
+        title, description, customer_name, company_name,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    INSERT INTO base_order_fts (rowid, title, description, customer_name, company_name)
+    SELECT o.id, o.title, o.description, o.customer_name, c.name
+    FROM base_order o LEFT JOIN base_company c ON c.id = o.company_name_id
+    """,
+    """
+    CREATE TRIGGER base_order_fts_insert AFTER INSERT ON base_order BEGIN
+        INSERT INTO base_order_fts (rowid, title, description, customer_name, company_name)
+        VALUES (new.id, new.title, new.description, new.customer_name,
+                (SELECT name FROM base_company WHERE id = new.company_name_id));
+    END
+    """,
+    # payment and status edits do not touch the index
+    """
+    CREATE TRIGGER base_order_fts_update
+    AFTER UPDATE OF title, description, customer_name, company_name_id ON base_order BEGIN
+        DELETE FROM base_order_fts WHERE rowid = old.id;
+        INSERT INTO base_order_fts (rowid, title, description, customer_name, company_name)
+        VALUES (new.id, new.title, new.description, new.customer_name,
+                (SELECT name FROM base_company WHERE id = new.company_name_id));
+    END
+    """,
+    """
+    CREATE TRIGGER base_order_fts_delete AFTER DELETE ON base_order BEGIN
+        DELETE FROM base_order_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER base_company_fts_rename AFTER UPDATE OF name ON base_company BEGIN
+        UPDATE base_order_fts SET company_name = new.name
+        WHERE rowid IN (SELECT id FROM base_order WHERE company_name_id = new.id);
+    END
+    """,
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS base_company_fts_rename',
+    'DROP TRIGGER IF EXISTS base_order_fts_delete',
+    'DROP TRIGGER IF EXISTS base_order_fts_update',
+    'DROP TRIGGER IF EXISTS base_order_fts_insert',
+    'DROP TABLE IF EXISTS base_order_fts',
+]
+
+
+def run_sqlite(statements):
+    def run(apps, schema_editor):
+        # FTS5 is SQLite only; other databases keep the LIKE search
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0002_order_factor_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sqlite(CREATE_SQL), run_sqlite(DROP_SQL)),
+    ]
@@ -0,0 +1,133 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:04
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+from base.search import normalize_phone, normalize_search_sql, normalize_search_text
+
+order_search = import_module('base.migrations.0003_order_search')
+
+# the FTS index rebuilt on normalized text: title and description through
+# the same character map in SQL, names and phone from the shadow columns
+FTS_VALUES = (
+    f"{normalize_search_sql('{row}.title')}, {normalize_search_sql('{row}.description')}, "
+    "{row}.customer_search, {company}, {row}.phone_search"
+)
+FTS_COLUMNS = '(rowid, title, description, customer_name, company_name, phone_number)'
+ORDER_COMPANY_SEARCH = '(SELECT name_search FROM base_company WHERE id = new.company_name_id)'
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE base_order_fts USING fts5(
+        title, description, customer_name, company_name, phone_number,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    f"""
+    INSERT INTO base_order_fts {FTS_COLUMNS}
+    SELECT o.id, {FTS_VALUES.format(row='o', company='c.name_search')}
+    FROM base_order o LEFT JOIN base_company c ON c.id = o.company_name_id
+    """,
+    f"""
+    CREATE TRIGGER base_order_fts_insert AFTER INSERT ON base_order BEGIN
+        INSERT INTO base_order_fts {FTS_COLUMNS}
+        VALUES (new.id, {FTS_VALUES.format(row='new', company=ORDER_COMPANY_SEARCH)});
+    END
+    """,
+    f"""
+    CREATE TRIGGER base_order_fts_update
+    AFTER UPDATE OF title, description, customer_search, phone_search, company_name_id ON base_order BEGIN
+        DELETE FROM base_order_fts WHERE rowid = old.id;
+        INSERT INTO base_order_fts {FTS_COLUMNS}
+        VALUES (new.id, {FTS_VALUES.format(row='new', company=ORDER_COMPANY_SEARCH)});
+    END
+    """,
+    """
+    CREATE TRIGGER base_order_fts_delete AFTER DELETE ON base_order BEGIN
+        DELETE FROM base_order_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER base_company_fts_rename AFTER UPDATE OF name_search ON base_company BEGIN
+        UPDATE base_order_fts SET company_name = new.name_search
+        WHERE rowid IN (SELECT id FROM base_order WHERE company_name_id = new.id);
+    END
+    """,
+]
+
+
+def backfill(model, db, source_fields, search_fields):
+    # در دسته‌های ۲۰۰۰تایی به ترتیب id، بدون خواندن و نوشتن همزمان یک جدول
+    last_id = 0
+    while True:
+        objs = list(model.objects.using(db).filter(id__gt=last_id).order_by('id').only(*source_fields)[:2000])
+        if not objs:
+            return
+        for obj in objs:
+            name, phone = (getattr(obj, field) for field in source_fields)
+            setattr(obj, search_fields[0], normalize_search_text(name))
+            setattr(obj, search_fields[1], normalize_phone(phone))
+        model.objects.using(db).bulk_update(objs, search_fields, batch_size=500)
+        last_id = objs[-1].id
+
+
+def backfill_search_columns(apps, schema_editor):
+    db = schema_editor.connection.alias
+    backfill(apps.get_model('base', 'Company'), db, ('name', 'phone_number'), ('name_search', 'phone_search'))
+    backfill(apps.get_model('base', 'Order'), db, ('customer_name', 'phone_number'), ('customer_search', 'phone_search'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0003_order_search'),
+    ]
+
+    # SQLite copies base_order/base_company into new tables to add the
+    # columns, which the FTS triggers would break, so they go first and
+    # come back on the normalized columns at the end
+    operations = [
+        migrations.RunPython(
+            order_search.run_sqlite(order_search.DROP_SQL),
+            order_search.run_sqlite(order_search.CREATE_SQL),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='name_search',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='phone_search',
+            field=models.CharField(blank=True, default='', editable=False, max_length=13),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='customer_search',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='phone_search',
+            field=models.CharField(blank=True, default='', editable=False, max_length=13),
+        ),
+        migrations.RunPython(backfill_search_columns, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='company',
+            index=models.Index(fields=['name_search'], name='company_name_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='company',
+            index=models.Index(fields=['phone_search'], name='company_phone_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer_search'], name='order_customer_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['phone_search'], name='order_phone_search_idx'),
+        ),
+        migrations.RunPython(order_search.run_sqlite(CREATE_SQL), order_search.run_sqlite(order_search.DROP_SQL)),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:30
+
+import django_jalali.db.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0004_search_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FactorJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'در صف'), ('running', 'در حال تولید'), ('done', 'آماده'), ('failed', 'ناموفق')], default='pending', max_length=10, verbose_name='وضعیت')),
+                ('order_ids', models.JSONField(verbose_name='سفارش\u200cها')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='تعداد فاکتورها')),
+                ('progress', models.PositiveIntegerField(default=0, verbose_name='فاکتورهای تولید شده')),
+                ('file_name', models.CharField(blank=True, max_length=255, verbose_name='نام فایل')),
+                ('error', models.TextField(blank=True, verbose_name='خطا')),
+                ('created_at', django_jalali.db.models.jDateTimeField(auto_now_add=True, verbose_name='تاریخ ثبت')),
+                ('finished_at', django_jalali.db.models.jDateTimeField(blank=True, null=True, verbose_name='تاریخ پایان')),
+            ],
+            options={
+                'verbose_name': 'تولید فاکتور',
+                'verbose_name_plural': 'صف تولید فاکتور',
+                'ordering': ['-id'],
+                'managed': True,
+            },
+        ),
+    ]
@@ -2,8 +2,13 @@ from django.db import models
 from django_jalali.db import models as jmodels
 from django.core.exceptions import ValidationError
 import jdatetime
+from base.search import normalize_phone, normalize_search_text
 # Create your models here.
 
+# ستون‌های جمع سفارشات شرکت، که فقط از روی سفارش‌ها نوشته می‌شوند
+COMPANY_TOTAL_FIELDS = ('total_orders', 'total_payments', 'total_costs', 'remaining_payments')
+
+
 class Company(models.Model):
     name = models.CharField(
         max_length=255, 
@@ -53,9 +58,24 @@ class Company(models.Model):
         help_text="مبلغ پرداخت‌نشده توسط شرکت (ریال).",
         editable=False
     )
+    # نام و شماره نرمال‌شده برای جستجوی پیشوندی (ی/ي، ک/ك، نیم‌فاصله، ارقام فارسی)
+    name_search = models.CharField(max_length=255, blank=True, default='', editable=False)
+    phone_search = models.CharField(max_length=13, blank=True, default='', editable=False)
+
+    def update_search_fields(self):
+        self.name_search = normalize_search_text(self.name)
+        self.phone_search = normalize_phone(self.phone_number)
 
     def save(self, *args, **kwargs):
         self.remaining_payments = self.total_costs - self.total_payments
+        self.update_search_fields()
+        # جمع‌های شرکت موجود با UPDATE های F() در base.signals به‌روز می‌شوند؛
+        # ویرایش شرکت نباید مقدارهایی را که پیش‌تر خوانده روی آن‌ها بنویسد
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in COMPANY_TOTAL_FIELDS
+            ]
         return super().save(*args, **kwargs)
     
     def clean(self):
@@ -72,6 +92,10 @@ class Company(models.Model):
         verbose_name = "شرکت"
         verbose_name_plural = "شرکت‌ها"
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name_search'], name='company_name_search_idx'),
+            models.Index(fields=['phone_search'], name='company_phone_search_idx'),
+        ]
     
 
 class Order(models.Model):
@@ -158,10 +182,13 @@ class Order(models.Model):
         help_text="در صورت تایید مبلغ پرداختی برابر با هزینه کل ثبت میشود. "
     )
     order_date = jmodels.jDateTimeField(
-        default=jdatetime.datetime.now(),
+        default=jdatetime.datetime.now,
         verbose_name="تاریخ ایجاد",
         help_text="تاریخ ثبت سفارش (به صورت خودکار ثبت می‌شود)."
     )
+    # نام مشتری و شماره نرمال‌شده برای جستجوی پیشوندی
+    customer_search = models.CharField(max_length=255, blank=True, default='', editable=False)
+    phone_search = models.CharField(max_length=13, blank=True, default='', editable=False)
 
     def __str__(self):
         if self.company_name:
@@ -172,6 +199,14 @@ class Order(models.Model):
             customer_info = "نامشخص"
 
         return f"سفارش {self.title} توسط {customer_info}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # شرکت سفارش هنگام خواندن، تا با تغییر شرکت مجموع‌های شرکت قبلی هم به‌روز شود
+        if 'company_name_id' in instance.__dict__:
+            instance._loaded_company_id = instance.company_name_id
+        return instance
     
 
     def clean(self):
@@ -204,14 +239,30 @@ class Order(models.Model):
         if self.payment_status:
             self.remaining_payment = 0
             self.payment = self.total_cost
+        self.update_search_fields()
         super().save(*args, **kwargs)
 
+    def update_search_fields(self):
+        self.customer_search = normalize_search_text(self.customer_name)
+        self.phone_search = normalize_phone(self.phone_number)
+
 
     class Meta:
         managed = True
         verbose_name = 'سفارش'
         verbose_name_plural = 'سفارشات'
         ordering = ['-order_date']  # Newest orders first
+        # matched to the OrderAdmin filters, all sorted by -order_date. Pending and
+        # unpaid orders are the minority the filters look for, so they get
+        # small partial indexes; done/paid use the plain date index.
+        indexes = [
+            models.Index(fields=['order_date'], name='order_date_idx'),
+            models.Index(fields=['order_date'], condition=models.Q(order_status=False), name='order_pending_date_idx'),
+            models.Index(fields=['order_date'], condition=models.Q(payment_status=False), name='order_unpaid_date_idx'),
+            models.Index(fields=['company_name', 'order_date'], name='order_company_date_idx'),
+            models.Index(fields=['customer_search'], name='order_customer_search_idx'),
+            models.Index(fields=['phone_search'], name='order_phone_search_idx'),
+        ]
 
 
 class Factor(models.Model):
@@ -243,7 +294,7 @@ class Factor(models.Model):
     help_text="مجموع هزینه‌ها (ریال)."
     )
     factor_date = jmodels.jDateTimeField(
-    default=jdatetime.datetime.now(),
+    default=jdatetime.datetime.now,
     verbose_name="تاریخ ایجاد",
     help_text="تاریخ ایجاد فاکتور (به صورت خودکار ثبت می‌شود)."
     )
@@ -263,5 +314,41 @@ class Factor(models.Model):
         verbose_name = 'فاکتور'
         verbose_name_plural = 'فاکتورها'
         ordering = ['-factor_date']  # Newest first
+        # matched to the FactorAdmin filters, sorted by -factor_date
+        indexes = [
+            models.Index(fields=['factor_date'], name='factor_date_idx'),
+            models.Index(fields=['company', 'factor_date'], name='factor_company_date_idx'),
+        ]
         
 
+
+
+class FactorJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'در صف'),
+        (RUNNING, 'در حال تولید'),
+        (DONE, 'آماده'),
+        (FAILED, 'ناموفق'),
+    ]
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name="وضعیت")
+    order_ids = models.JSONField(verbose_name="سفارش‌ها")
+    total = models.PositiveIntegerField(default=0, verbose_name="تعداد فاکتورها")
+    progress = models.PositiveIntegerField(default=0, verbose_name="فاکتورهای تولید شده")
+    file_name = models.CharField(max_length=255, blank=True, verbose_name="نام فایل")
+    error = models.TextField(blank=True, verbose_name="خطا")
+    created_at = jmodels.jDateTimeField(auto_now_add=True, verbose_name="تاریخ ثبت")
+    finished_at = jmodels.jDateTimeField(blank=True, null=True, verbose_name="تاریخ پایان")
+
+    def __str__(self):
+        return f"تولید فاکتور {self.id}"
+
+    class Meta:
+        managed = True
+        verbose_name = 'تولید فاکتور'
+        verbose_name_plural = 'صف تولید فاکتور'
+        ordering = ['-id']
@@ -0,0 +1,95 @@
+from datetime import datetime
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+# بیشتر از این تعداد شمرده نمی‌شود؛ «بیش از ...» نمایش داده می‌شود
+ORDER_COUNT_LIMIT = 10000
+
+KEYSET_AFTER_VAR = 'after'
+KEYSET_BEFORE_VAR = 'before'
+KEYSET_ORDERING = ('-order_date', '-pk')
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator counting at most `count_limit` rows, so a large filtered
+    changelist never runs a full COUNT(*). `count_capped` tells whether
+    there are more. Only for keyset paging: numbered pages past the cap
+    would be out of range.
+    """
+    count_limit = ORDER_COUNT_LIMIT
+
+    def __init__(self, *args, count_limit=None, **kwargs):
+        if count_limit is not None:
+            self.count_limit = count_limit
+        super().__init__(*args, **kwargs)
+
+    @cached_property
+    def count(self):
+        return self.object_list.order_by()[:self.count_limit + 1].count()
+
+    @property
+    def count_capped(self):
+        return self.count > self.count_limit
+
+
+def encode_cursor(order):
+    # تاریخ میلادی به وقت محلی، همان‌طور که در پایگاه‌داده ذخیره می‌شود
+    return f"{order.order_date.togregorian().strftime('%Y%m%d%H%M%S%f')}-{order.pk}"
+
+
+def decode_cursor(cursor):
+    """(order_date, pk) of an encode_cursor() value, or None if it is not one."""
+    try:
+        date, pk = cursor.split('-')
+        return timezone.make_aware(datetime.strptime(date, '%Y%m%d%H%M%S%f')), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def older_than(order_date, pk):
+    # order_date__lte اول، تا SQLite از ایندکس تاریخ برای بازه استفاده کند
+    return Q(order_date__lte=order_date) & (Q(order_date__lt=order_date) | Q(pk__lt=pk))
+
+
+def newer_than(order_date, pk):
+    return Q(order_date__gte=order_date) & (Q(order_date__gt=order_date) | Q(pk__gt=pk))
+
+
+def keyset_page(queryset, per_page, after=None, before=None):
+    """
+    One page of `queryset`, ordered by KEYSET_ORDERING, that starts after
+    the `after` cursor or ends before the `before` cursor (the first page
+    without either). An `after` cursor past the last order, e.g. after
+    the last page was deleted, gives the last page. Each page seeks on the (order_date, id) index, so a
+    deep page costs the same as the first one.
+    Returns (page queryset, has_previous, has_next).
+    """
+    queryset = queryset.order_by(*KEYSET_ORDERING)
+    page = queryset[:per_page]
+    has_previous = False
+    if after:
+        page = queryset.filter(older_than(*after))[:per_page]
+        has_previous = True
+    elif before:
+        newer = list(
+            queryset.filter(newer_than(*before)).order_by('order_date', 'pk')
+            .values_list('order_date', 'pk')[:per_page + 1]
+        )
+        # نزدیک ابتدای لیست، صفحه اول کامل نمایش داده می‌شود
+        if len(newer) > per_page:
+            newest_date, newest_pk = newer[per_page - 1]
+            # pk + 1 تا خود جدیدترین سفارش صفحه هم در آن باشد
+            page = queryset.filter(newer_than(*before), older_than(newest_date, newest_pk + 1))[:per_page]
+            has_previous = True
+
+    orders = list(page)
+    if after and not orders:
+        # pk - 1 تا خود سفارش cursor، اگر هنوز هست، در صفحه آخر بماند
+        return keyset_page(queryset, per_page, before=(after[0], after[1] - 1))
+    has_next = len(orders) == per_page and queryset.filter(
+        older_than(orders[-1].order_date, orders[-1].pk)).exists()
+    return page, has_previous, has_next
@@ -0,0 +1,120 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+# FTS5 index of the searchable order text, kept in sync by triggers (migration 0003)
+ORDER_SEARCH_TABLE = 'base_order_fts'
+
+
+# Arabic letters and digits clerks type for their Persian forms, ZWNJ and
+# tatweel, and the short vowel marks, which never change a name
+SEARCH_CHAR_MAP = {
+    'ي': 'ی', 'ى': 'ی', 'ئ': 'ی', 'ك': 'ک', 'ۀ': 'ه', 'ة': 'ه', 'أ': 'ا', 'إ': 'ا', 'ٱ': 'ا',
+    '\u200c': ' ', '\u200d': '', '\u0640': '',
+    **{chr(code): '' for code in range(0x064b, 0x0653)},
+    **{persian: str(i) for i, persian in enumerate('۰۱۲۳۴۵۶۷۸۹')},
+    **{arabic: str(i) for i, arabic in enumerate('٠١٢٣٤٥٦٧٨٩')},
+}
+SEARCH_CHARS = str.maketrans(SEARCH_CHAR_MAP)
+
+# the part of SEARCH_CHAR_MAP the FTS index applies itself: unicode61
+# already splits words on ZWNJ, and digits are matched in all three
+# scripts instead (SQLite allows only ~30 nested replace() calls)
+FTS_CHAR_MAP = {char: replacement for char, replacement in SEARCH_CHAR_MAP.items()
+                if char not in '\u200c\u200d' and not replacement.isdigit()}
+PERSIAN_DIGITS = str.maketrans('0123456789', '۰۱۲۳۴۵۶۷۸۹')
+ARABIC_DIGITS = str.maketrans('0123456789', '٠١٢٣٤٥٦٧٨٩')
+
+# longest prefix a text can have, for range lookups on the shadow columns
+PREFIX_END = '\U0010ffff'
+
+
+def normalize_search_text(text):
+    """`text` with SEARCH_CHAR_MAP applied, lower case and single spaces, as stored in the *_search columns."""
+    return ' '.join(str(text or '').translate(SEARCH_CHARS).lower().split())
+
+
+def normalize_phone(text):
+    """Digits of the phone number `text`, so 0912-123 4567 and ۰۹۱۲۱۲۳۴۵۶۷ compare equal."""
+    return re.sub(r'\D', '', str(text or '').translate(SEARCH_CHARS))
+
+
+def normalize_search_sql(column):
+    """SQL expression applying FTS_CHAR_MAP to `column`, for the FTS triggers."""
+    for char, replacement in FTS_CHAR_MAP.items():
+        column = f"replace({column}, '{char}', '{replacement}')"
+    return column
+
+
+def prefix_lookup(field, prefix):
+    """
+    Q for values of `field` starting with `prefix`, as a range so it is
+    answered from the index on any database (SQLite skips the index for
+    LIKE on columns without NOCASE).
+    """
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix + PREFIX_END})
+
+
+def order_search_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def fts_match_expression(search_term):
+    """
+    FTS5 query matching orders that contain every word of `search_term`,
+    each as a prefix, so partly typed words already match. Words with
+    digits match them in Latin, Persian and Arabic script.
+    """
+    words = [word for word in normalize_search_text(search_term).split() if any(char.isalnum() for char in word)]
+    terms = []
+    for word in words:
+        variants = dict.fromkeys([word, word.translate(PERSIAN_DIGITS), word.translate(ARABIC_DIGITS)])
+        prefixes = ['"{}"*'.format(variant.replace('"', '""')) for variant in variants]
+        terms.append(prefixes[0] if len(prefixes) == 1 else '({})'.format(' OR '.join(prefixes)))
+    return ' AND '.join(terms)
+
+
+def search_orders(queryset, search_term):
+    """
+    Filter `queryset` to the orders matching `search_term` and add
+    `search_rank` (bm25, lower is better). The FTS table is joined on
+    rowid, so SQLite reads the matches from the index and computes each
+    rank once.
+    """
+    match = fts_match_expression(search_term)
+    if not match:
+        return queryset.none()
+    table = ORDER_SEARCH_TABLE
+    return queryset.extra(
+        tables=[table],
+        where=[f'{table} MATCH %s', f'{table}.rowid = "{queryset.model._meta.db_table}"."id"'],
+        params=[match],
+        select={'search_rank': f'{table}.rank'},
+    )
+
+
+def name_and_phone_prefix(search_term, name_field, phone_field):
+    """
+    Q for rows whose normalized name (or phone, for a term of digits)
+    starts with `search_term`, or None for a term with nothing to match.
+    """
+    name = normalize_search_text(search_term)
+    if not name:
+        return None
+    condition = prefix_lookup(name_field, name)
+    phone = normalize_phone(name)
+    if phone and not any(char.isalpha() for char in name):
+        condition |= prefix_lookup(phone_field, phone)
+    return condition
+
+
+def search_name_and_phone(queryset, search_term, name_field, phone_field):
+    """
+    Filter `queryset` to rows whose normalized name (or phone, for a term
+    of digits) starts with `search_term`, using the indexed shadow columns.
+    """
+    condition = name_and_phone_prefix(search_term, name_field, phone_field)
+    if condition is None:
+        return queryset.none()
+    return queryset.filter(condition)
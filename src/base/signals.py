@@ -0,0 +1,113 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from base.cache import invalidate_company_choices, invalidate_order_summaries
+from base.models import Company, Order
+from base.utils import refresh_company_totals
+
+deferred_state = threading.local()
+
+
+@contextmanager
+def deferred_company_totals():
+    """
+    Within the block, only collect the companies whose orders are saved or
+    deleted, and refresh their totals with refresh_company_totals() once
+    the block ends, instead of one UPDATE per order. The order summaries
+    are invalidated once at the end as well.
+    """
+    if getattr(deferred_state, 'company_ids', None) is not None:
+        # already deferred by an outer block
+        yield
+        return
+    deferred_state.company_ids = set()
+    try:
+        yield
+        company_ids = deferred_state.company_ids
+    finally:
+        deferred_state.company_ids = None
+    refresh_company_totals(company_ids)
+    invalidate_order_summaries()
+
+
+def apply_company_delta(company_id, orders, costs, payments):
+    """Add the given differences to a company's totals in one UPDATE, without reading them first."""
+    if not company_id or not (orders or costs or payments):
+        return
+    Company.objects.filter(pk=company_id).update(
+        total_orders=F('total_orders') + orders,
+        total_costs=F('total_costs') + costs,
+        total_payments=F('total_payments') + payments,
+        remaining_payments=F('remaining_payments') + (costs - payments),
+    )
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_totals(sender, instance, raw, **kwargs):
+    # مقادیر قبلی سفارش تا پس از ذخیره فقط تفاوت آن‌ها به شرکت اعمال شود
+    instance._company_totals_old = None
+    if raw or instance.pk is None:
+        return
+    company_ids = getattr(deferred_state, 'company_ids', None)
+    if company_ids is not None:
+        # شرکت هنگام خواندن سفارش کافی است؛ مجموع‌ها در پایان از نو حساب می‌شوند
+        if hasattr(instance, '_loaded_company_id'):
+            company_ids.add(instance._loaded_company_id)
+        else:
+            company_ids.update(Order.objects.filter(pk=instance.pk).values_list('company_name_id', flat=True))
+        return
+    instance._company_totals_old = (
+        Order.objects.filter(pk=instance.pk).values_list('company_name_id', 'total_cost', 'payment').first()
+    )
+
+
+@receiver(post_save, sender=Order)
+def update_company_totals_on_save(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    company_ids = getattr(deferred_state, 'company_ids', None)
+    if company_ids is not None:
+        company_ids.add(instance.company_name_id)
+        return
+    invalidate_order_summaries()
+    old = getattr(instance, '_company_totals_old', None)
+    instance._company_totals_old = None
+    new_company_id = instance.company_name_id
+
+    if old is None:
+        apply_company_delta(new_company_id, 1, instance.total_cost, instance.payment)
+        return
+
+    old_company_id, old_cost, old_payment = old
+    if old_company_id == new_company_id:
+        apply_company_delta(new_company_id, 0, instance.total_cost - old_cost, instance.payment - old_payment)
+    else:
+        apply_company_delta(old_company_id, -1, -old_cost, -old_payment)
+        apply_company_delta(new_company_id, 1, instance.total_cost, instance.payment)
+
+
+@receiver(post_delete, sender=Order)
+def update_company_totals_on_delete(sender, instance, **kwargs):
+    company_ids = getattr(deferred_state, 'company_ids', None)
+    if company_ids is not None:
+        company_ids.add(instance.company_name_id)
+        return
+    invalidate_order_summaries()
+    apply_company_delta(instance.company_name_id, -1, -instance.total_cost, -instance.payment)
+
+
+@receiver(post_save, sender=Company)
+def invalidate_caches_on_company_save(sender, instance, raw, **kwargs):
+    # جستجوی سفارش‌ها نام شرکت را هم در بر می‌گیرد
+    if not raw:
+        invalidate_order_summaries()
+        invalidate_company_choices()
+
+
+@receiver(post_delete, sender=Company)
+def invalidate_caches_on_company_delete(sender, instance, **kwargs):
+    invalidate_company_choices()
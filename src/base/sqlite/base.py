@@ -0,0 +1,151 @@
+"""
+SQLite backend with one write path per database file.
+
+A transaction begins with BEGIN (IMMEDIATE, see settings) only once the
+thread holds the process-wide write lock of its database file, and keeps
+the lock until it commits or rolls back; a write outside a transaction
+holds it for the statement. Threads of a server process so wait in turn
+on the lock instead of polling SQLite's busy handler. A BEGIN or a write
+that still finds the file locked by another process, after the busy
+timeout, is retried with exponential backoff; nothing has run in the
+transaction yet, so that is safe.
+
+Within deferred_transactions() (GET requests, see base.middleware) a
+transaction begins DEFERRED without the lock, so pages that only read
+never hold up writers. Its first write takes the lock, which it keeps
+until the transaction ends.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db.backends.sqlite3 import base
+from django.db.utils import OperationalError
+
+# تعداد تلاش دوباره و تأخیر پایه (ثانیه) برای نوشتنی که پایگاه‌داده را قفل‌شده می‌یابد
+WRITE_RETRIES = 4
+WRITE_RETRY_DELAY = 0.05
+
+# یک قفل برای هر فایل پایگاه‌داده در هر پروسه
+write_locks = {}
+
+# دستورهایی که چیزی نمی‌نویسند؛ BEGIN بدون حالت (DEFERRED) هم قفلی نمی‌گیرد
+READ_STATEMENTS = ('SELECT', 'PRAGMA', 'EXPLAIN', 'SAVEPOINT', 'RELEASE', 'ROLLBACK')
+
+# خواندن تراکنش پیش از نوشتن قدیمی شده است؛ تکرار همان دستور فایده‌ای ندارد
+SQLITE_BUSY_SNAPSHOT = 517
+
+deferred_state = threading.local()
+
+
+@contextmanager
+def deferred_transactions():
+    """Within the block, transactions of this thread begin DEFERRED, without the write lock."""
+    previous = getattr(deferred_state, 'active', False)
+    deferred_state.active = True
+    try:
+        yield
+    finally:
+        deferred_state.active = previous
+
+
+def is_locked_error(error):
+    if getattr(error, 'sqlite_errorcode', None) == SQLITE_BUSY_SNAPSHOT:
+        return False
+    return 'locked' in str(error) or 'busy' in str(error)
+
+
+def is_read(query):
+    statement = query.lstrip()[:9].upper()
+    return statement.startswith(READ_STATEMENTS) or statement.rstrip(' ;') == 'BEGIN'
+
+
+class SerializedWriteCursor(base.SQLiteCursorWrapper):
+    def __init__(self, connection, wrapper):
+        super().__init__(connection)
+        self.wrapper = wrapper
+
+    def execute(self, query, params=None):
+        if self.wrapper.holds_write_lock or is_read(query):
+            return super().execute(query, params)
+        return self.wrapper.serialized_write(super().execute, query, params)
+
+    def executemany(self, query, param_list):
+        if self.wrapper.holds_write_lock:
+            return super().executemany(query, param_list)
+        # یک بار دیگر هم خوانده شود اگر تلاش دوباره لازم شد
+        return self.wrapper.serialized_write(super().executemany, query, list(param_list))
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    write_lock = None
+    holds_write_lock = False
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.write_retries = kwargs.pop('write_retries', WRITE_RETRIES)
+        self.write_retry_delay = kwargs.pop('write_retry_delay', WRITE_RETRY_DELAY)
+        # منتظر قفل پروسه هم همان‌قدر می‌ماند که SQLite برای قفل فایل (busy_timeout)
+        self.write_lock_timeout = kwargs.get('timeout', 5)
+        if not self.is_in_memory_db():
+            self.write_lock = write_locks.setdefault(str(self.settings_dict['NAME']), threading.RLock())
+        return kwargs
+
+    def create_cursor(self, name=None):
+        return self.connection.cursor(factory=lambda connection: SerializedWriteCursor(connection, self))
+
+    def _start_transaction_under_autocommit(self):
+        if getattr(deferred_state, 'active', False):
+            self.cursor().execute('BEGIN')
+        else:
+            super()._start_transaction_under_autocommit()
+
+    def serialized_write(self, execute, *args):
+        """
+        Run `execute(*args)` holding the write lock, retrying with backoff
+        while the database is locked. Inside a transaction (a BEGIN
+        IMMEDIATE, or the first write of a deferred one) the lock is kept
+        until the transaction ends.
+        """
+        if self.write_lock is None:
+            return execute(*args)
+        for attempt in range(self.write_retries + 1):
+            last = attempt == self.write_retries
+            if self.write_lock.acquire(timeout=self.write_lock_timeout):
+                try:
+                    result = execute(*args)
+                except (base.Database.OperationalError, OperationalError) as e:
+                    self.write_lock.release()
+                    if last or not is_locked_error(e):
+                        raise
+                else:
+                    if self.connection.in_transaction:
+                        self.holds_write_lock = True
+                    else:
+                        self.write_lock.release()
+                    return result
+            elif last:
+                raise OperationalError("database is locked")
+            time.sleep(self.write_retry_delay * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    def release_write_lock(self):
+        if self.holds_write_lock:
+            self.holds_write_lock = False
+            self.write_lock.release()
+
+    def _commit(self):
+        super()._commit()
+        self.release_write_lock()
+
+    def _rollback(self):
+        try:
+            super()._rollback()
+        finally:
+            self.release_write_lock()
+
+    def _close(self):
+        try:
+            super()._close()
+        finally:
+            self.release_write_lock()
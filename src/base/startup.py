@@ -0,0 +1,116 @@
+import hashlib
+import os
+import pkgutil
+import time
+from contextlib import contextmanager
+from importlib.util import find_spec
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+
+# در STATIC_ROOT، تا با پاک شدن فایل‌های جمع‌شده، اثر انگشت هم از بین برود
+STATIC_FINGERPRINT_FILE = '.collectstatic'
+# الگوهای پیش‌فرض collectstatic برای فایل‌هایی که کپی نمی‌شوند
+STATIC_IGNORE_PATTERNS = ['CVS', '.*', '*~']
+
+
+class StartupTimer:
+    """Durations of the startup stages, reported once the server is up."""
+
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        # the block may set stage['note'], e.g. to 'skipped'
+        stage = {'name': name, 'note': ''}
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage['seconds'] = time.perf_counter() - start
+            self.stages.append(stage)
+
+    def report(self):
+        stages = ', '.join(
+            f"{stage['name']}{' ' + stage['note'] if stage['note'] else ''} {stage['seconds']:.2f}s"
+            for stage in self.stages
+        )
+        return f"{stages}; serving after {time.perf_counter() - self.start:.2f}s"
+
+
+def static_fingerprint():
+    """Hash of every file collectstatic would copy (size, mtime) and of its copy in STATIC_ROOT (size)."""
+    entries = []
+    for finder in get_finders():
+        for path, storage in finder.list(STATIC_IGNORE_PATTERNS):
+            prefixed = os.path.join(getattr(storage, 'prefix', None) or '', path)
+            source = os.stat(storage.path(path))
+            try:
+                copied = os.stat(os.path.join(settings.STATIC_ROOT, prefixed)).st_size
+            except OSError:
+                copied = None
+            entries.append(f'{prefixed}\0{source.st_size}\0{source.st_mtime_ns}\0{copied}')
+    digest = hashlib.sha256()
+    for entry in sorted(entries):
+        digest.update(entry.encode() + b'\n')
+    return digest.hexdigest()
+
+
+def pending_migrations(using=DEFAULT_DB_ALIAS):
+    """
+    (app label, name) of the migration files on disk not recorded as applied.
+    Lists the migration packages without importing them and reads
+    django_migrations once, instead of building the migration graph.
+    """
+    on_disk = set()
+    for app_config in apps.get_app_configs():
+        module_name, _ = MigrationLoader.migrations_module(app_config.label)
+        try:
+            spec = module_name and find_spec(module_name)
+        except ModuleNotFoundError:
+            spec = None
+        if not spec or not spec.submodule_search_locations:
+            continue
+        on_disk.update(
+            (app_config.label, name)
+            for _, name, is_package in pkgutil.iter_modules(spec.submodule_search_locations)
+            if not is_package and name[0] not in '_~'
+        )
+    recorder = MigrationRecorder(connections[using])
+    applied = set(recorder.applied_migrations()) if recorder.has_table() else set()
+    return on_disk - applied
+
+
+def prepare(timer, full=False):
+    """
+    The collectstatic and migrate steps of a launch, each skipped when
+    nothing it would do has changed since it last ran, unless `full`.
+    """
+    fingerprint_path = os.path.join(settings.STATIC_ROOT, STATIC_FINGERPRINT_FILE)
+    with timer.stage('collectstatic') as stage:
+        try:
+            with open(fingerprint_path) as f:
+                last_fingerprint = f.read()
+        except OSError:
+            last_fingerprint = None
+        if full or static_fingerprint() != last_fingerprint:
+            call_command('collectstatic', interactive=False, verbosity=0)
+            # بعد از کپی، چون اندازه فایل‌های کپی‌شده هم در اثر انگشت است
+            with open(fingerprint_path, 'w') as f:
+                f.write(static_fingerprint())
+        else:
+            stage['note'] = 'skipped'
+
+    with timer.stage('migrate') as stage:
+        if full or pending_migrations():
+            call_command('migrate', interactive=False, verbosity=0)
+        else:
+            stage['note'] = 'skipped'
+    connections.close_all()
@@ -0,0 +1,108 @@
+from reportlab.pdfgen import canvas
+from reportlab.pdfbase.pdfdoc import (
+    PDFDocument, PDFFile, PDFIndirectObject, PDFObjectReference,
+    PDFCrossReferenceTable, PDFTrailer,
+)
+
+
+class StreamingPDFDocument(PDFDocument):
+    """
+    PDFDocument that writes every finished page (page dictionary and content
+    stream) to `write` as soon as it is closed, instead of keeping the whole
+    document in memory until save. Fonts, the page tree and the xref table
+    are written at the end, as they are only complete then.
+    """
+
+    def __init__(self, write, **kwargs):
+        super().__init__(**kwargs)
+        self._write = write
+        self._offset = 0
+        self._written = set()
+        self._flushed_pages = 0
+
+    def _emit(self, data):
+        offset = self._offset
+        self._write(data)
+        self._offset += len(data)
+        return offset
+
+    def _emit_object(self, obj):
+        name = obj.__InternalName__
+        data = PDFIndirectObject(name, obj).format(self)
+        self.idToOffset[name] = self._emit(data)
+        self._written.add(name)
+        # the object is already in the output, keep only its registration
+        self.idToObject[name] = None
+
+    def flushPages(self):
+        if not self._offset:
+            self._emit(PDFFile(self._pdfVersion).format(self))
+
+        pages = self.Pages.pages
+        for i in range(self._flushed_pages, len(pages)):
+            page = pages[i]
+            self._emit_object(page)
+            self._emit_object(page.Contents)
+            pages[i] = PDFObjectReference(page.__InternalName__)
+        self._flushed_pages = len(pages)
+
+    def format(self):
+        self.flushPages()
+        self.encrypt.prepare(self)
+        cat = self.Reference(self.Catalog)
+        info = self.Reference(self.info)
+        encryptinfo = self.encrypt.info()
+        encryptref = self.Reference(encryptinfo) if encryptinfo else None
+
+        # objects may register new objects while formatting, so walk by number
+        counter = 0
+        ids = []
+        while True:
+            counter += 1
+            if counter not in self.numberToId:
+                break
+            oid = self.numberToId[counter]
+            if oid not in self._written:
+                data = PDFIndirectObject(oid, self.idToObject[oid]).format(self)
+                self.idToOffset[oid] = self._emit(data)
+            ids.append(oid)
+
+        xref = PDFCrossReferenceTable()
+        xref.addsection(0, ids)
+        xrefoffset = self._emit(xref.format(self))
+        trailer = PDFTrailer(
+            startxref=xrefoffset,
+            Size=len(ids) + 1,
+            Root=cat,
+            Info=info,
+            Encrypt=encryptref,
+            ID=self.ID(),
+        )
+        self._emit(trailer.format(self))
+        return b''
+
+
+class StreamingCanvas(canvas.Canvas):
+    """
+    Canvas whose output goes to `write` page by page.
+    Call finish() instead of save() once the last page is drawn.
+    """
+
+    def __init__(self, write, **kwargs):
+        super().__init__(None, **kwargs)
+        self._doc = StreamingPDFDocument(
+            write,
+            compression=self._pageCompression,
+            invariant=self._doc.invariant,
+            pdfVersion=self._doc._pdfVersion,
+        )
+        self._make_preamble()
+
+    def showPage(self):
+        super().showPage()
+        self._doc.flushPages()
+
+    def finish(self):
+        if len(self._code):
+            self.showPage()
+        self._doc.GetPDFData(self)
@@ -1,3 +1,828 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+import zipfile
+from decimal import Decimal
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+import jdatetime
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connection, connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from base import jobs, utils
+from base.admin import ORDER_INLINE_PER_PAGE, OrderAdmin
+from base.cache import company_choices_key, get_order_summary, order_summary_key
+from base.imports import import_orders
+from base.models import Company, Factor, FactorJob, Order
+from base.pagination import KEYSET_ORDERING, EstimatedCountPaginator, encode_cursor
+from base.search import search_name_and_phone, search_orders
+from base.middleware import DeferredTransactionsMiddleware
+from base.signals import deferred_company_totals
+from base.sqlite.base import deferred_state, deferred_transactions, write_locks
+from base.startup import pending_migrations
+from base.utils import ROWS_PER_PAGE, stream_factor_pdf
+from base.xlsx import stream_xlsx
+
+# cached summaries would hide queries, and tests must not touch the on-disk cache
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+XLSX_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AdminQueryBudgetTests(TestCase):
+    """
+    Maximum number of queries for each admin page, with enough rows that a
+    query per row would exceed it. Session and user lookups are included.
+    """
+
+    rows = 30
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.companies = [Company.objects.create(name=f'شرکت {i}', phone_number=f'0912000000{i}') for i in range(3)]
+        for i in range(cls.rows):
+            company = cls.companies[i % 3] if i % 2 else None
+            Order.objects.create(
+                title=f'بنر {i}', company_name=company, customer_name=None if company else f'مشتری {i}',
+                width=100, height=200, unit_cost=Decimal(1000), amount=2, payment=Decimal(500),
+            )
+            Factor.objects.create(company=company, customer=None if company else f'مشتری {i}', total_cost=2000)
+        FactorJob.objects.create(order_ids=list(Order.objects.values_list('id', flat=True)), total=cls.rows)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def assertMaxQueries(self, budget, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(
+            len(queries), budget,
+            f"{url} ran {len(queries)} queries:\n" + '\n'.join(query['sql'] for query in queries.captured_queries),
+        )
+        return response
+
+    def test_order_changelist(self):
+        url = reverse('admin:base_order_changelist')
+        self.assertMaxQueries(5, url)
+        self.assertMaxQueries(5, url, {'order_status': 'pending', 'payment_status': 'unpaid'})
+        self.assertMaxQueries(5, url, {'q': 'بنر'})
+        self.assertMaxQueries(5, url, {'o': '2'})
+        # the chosen company is the only one read for the filter
+        self.assertMaxQueries(6, url, {'company': self.companies[1].pk})
+
+    def test_order_change_page(self):
+        order = Order.objects.filter(company_name__isnull=False).first()
+        self.assertMaxQueries(5, reverse('admin:base_order_change', args=[order.pk]))
+        self.assertMaxQueries(2, reverse('admin:base_order_add'))
+
+    def test_company_changelist(self):
+        self.assertMaxQueries(5, reverse('admin:base_company_changelist'))
+
+    def test_company_change_page(self):
+        self.assertMaxQueries(5, reverse('admin:base_company_change', args=[self.companies[1].pk]))
+
+    def test_company_orders_are_paged(self):
+        company = Company.objects.create(name='شرکت بزرگ')
+        for i in range(ORDER_INLINE_PER_PAGE + 5):
+            Order.objects.create(title=f'سفارش {i}', company_name=company, width=1, height=1, unit_cost=Decimal(10))
+        url = reverse('admin:base_company_change', args=[company.pk])
+        response = self.assertMaxQueries(6, url)
+        formset = response.context['inline_admin_formsets'][0].formset
+        self.assertEqual(len(formset.forms), ORDER_INLINE_PER_PAGE)
+        self.assertFalse(formset.first_url)
+
+        response = self.assertMaxQueries(6, url + formset.next_url.split('#')[0])
+        formset = response.context['inline_admin_formsets'][0].formset
+        self.assertEqual([form.instance.title for form in formset.forms], [f'سفارش {i}' for i in range(4, -1, -1)])
+        self.assertTrue(formset.first_url)
+        self.assertFalse(formset.next_url)
+
+        # a cursor past the last order shows the last page
+        response = self.assertMaxQueries(7, url, {'after': '19000101000000000000-1'})
+        formset = response.context['inline_admin_formsets'][0].formset
+        self.assertEqual([form.instance.title for form in formset.forms],
+                         [f'سفارش {i}' for i in range(ORDER_INLINE_PER_PAGE - 1, -1, -1)])
+        self.assertTrue(formset.previous_url)
+
+    def test_company_autocomplete(self):
+        self.assertMaxQueries(5, reverse('admin:autocomplete'), {
+            'term': 'شركت', 'app_label': 'base', 'model_name': 'order', 'field_name': 'company_name',
+        })
+
+    def test_company_filter_choices(self):
+        url = reverse('admin:base_company_choices')
+        response = self.assertMaxQueries(4, url, {'term': 'شركت 1'})
+        self.assertEqual(response.json()['results'], [{'id': str(self.companies[1].pk), 'text': 'شرکت 1'}])
+        # the second request is served from the cache
+        self.assertMaxQueries(2, url, {'term': 'شرکت 1'})
+
+    def test_factor_changelist(self):
+        self.assertMaxQueries(5, reverse('admin:base_factor_changelist'))
+
+    def test_factor_change_page(self):
+        factor = Factor.objects.filter(company__isnull=False).first()
+        self.assertMaxQueries(5, reverse('admin:base_factor_change', args=[factor.pk]))
+
+    def test_factorjob_pages(self):
+        job = FactorJob.objects.get()
+        self.assertMaxQueries(5, reverse('admin:base_factorjob_changelist'))
+        self.assertMaxQueries(4, reverse('admin:base_factorjob_change', args=[job.pk]))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class OrderChangelistPagingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        for i in range(30):
+            Order.objects.create(title=f'بنر {i}', customer_name=f'مشتری {i}', width=1, height=1, unit_cost=Decimal(10))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        patches = [mock.patch.object(EstimatedCountPaginator, 'count_limit', 10),
+                   mock.patch.object(OrderAdmin, 'list_per_page', 5)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_keyset_pages_use_the_capped_count(self):
+        response = self.client.get(reverse('admin:base_order_changelist'))
+        cl = response.context['cl']
+        self.assertTrue(cl.keyset)
+        self.assertTrue(cl.paginator.count_capped)
+
+    def test_numbered_pages_past_the_cap(self):
+        # ترتیب دیگر و جستجو صفحه‌بندی شماره‌دار دارند؛ صفحه ۵ پس از سقف شمارش است
+        url = reverse('admin:base_order_changelist')
+        for params in ({'o': '1', 'p': '5'}, {'q': 'بنر', 'p': '5'}):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200, params)
+            cl = response.context['cl']
+            self.assertFalse(cl.keyset)
+            self.assertEqual(cl.result_count, 30)
+            self.assertEqual(len(cl.result_list), 5)
+
+    def test_cursor_past_the_last_order(self):
+        # a made-up cursor, and the last order of a page whose next page was deleted
+        last_page = list(Order.objects.order_by(*KEYSET_ORDERING)[25:])
+        oldest = last_page[-1]
+        url = reverse('admin:base_order_changelist')
+        for after in ('19000101000000000000-1', encode_cursor(oldest)):
+            response = self.client.get(url, {'after': after})
+            self.assertEqual(response.status_code, 200, after)
+            cl = response.context['cl']
+            self.assertEqual(list(cl.result_list), last_page, after)
+            self.assertTrue(cl.keyset_previous_url)
+            self.assertFalse(cl.keyset_next_url)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class OrderImportTests(TestCase):
+    header = 'title,company_name,width,height,unit_cost,amount,payment,order_date\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='چاپ پارس', phone_number='02112345678')
+
+    def import_csv(self, text, encoding='utf-8-sig'):
+        return import_orders(io.BytesIO((self.header + text).encode(encoding)), 'orders.csv')
+
+    def test_csv(self):
+        imported, errors = self.import_csv('بنر,چاپ پارس,100,200,"۱٬۰۰۰",۲,500,1403/01/20 10:30\n')
+        self.assertEqual((imported, errors), (1, []))
+        order = Order.objects.get()
+        self.assertEqual((order.company_name, order.total_cost, order.remaining_payment),
+                         (self.company, 2000, 1500))
+        self.assertEqual(order.order_date.strftime('%Y/%m/%d %H:%M'), '1403/01/20 10:30')
+        self.company.refresh_from_db()
+        self.assertEqual((self.company.total_orders, self.company.remaining_payments), (1, 1500))
+
+    def test_imported_orders_are_searchable(self):
+        self.import_csv('بنر,چاپ پارس,100,200,1000,1,,\n')
+        order = Order.objects.get()
+        self.assertEqual(order.phone_search, '02112345678')
+        self.assertEqual(list(search_orders(Order.objects.all(), '0211234')), [order])
+        self.assertEqual(list(search_name_and_phone(Order.objects.all(), '0211234', 'customer_search', 'phone_search')),
+                         [order])
+
+    def test_xlsx(self):
+        content = b''.join(stream_xlsx(
+            ['title', 'customer_name', 'width', 'height', 'unit_cost', 'amount', 'order_date'],
+            [['کارت ویزیت', 'مشتری', 9, 5, 1000, 3, 45000], ['بنر', 'مشتری', 100, 200, Decimal(2500), 1, '1403/02/01']],
+        ))
+        imported, errors = import_orders(io.BytesIO(content), 'orders.xlsx')
+        self.assertEqual((imported, errors), (2, []))
+        self.assertEqual(sorted(Order.objects.values_list('title', 'total_cost')),
+                         [('بنر', 2500), ('کارت ویزیت', 3000)])
+        # تاریخ عددی اکسل ۴۵۰۰۰ روز ۲۰۲۳/۰۳/۱۵ است
+        self.assertEqual(Order.objects.get(title='کارت ویزیت').order_date.strftime('%Y/%m/%d'), '1401/12/24')
+
+    def test_rejected_values(self):
+        imported, errors = self.import_csv(
+            'بنر,چاپ پارس,1,1,1000,NaN,,\n'
+            'بنر,چاپ پارس,1,1,1000,inf,,\n'
+            'بنر,چاپ پارس,1,1,1000,1,,99999999999\n'
+            'بنر,چاپ پارس,1,1,1000,1,,\n'
+        )
+        self.assertEqual(imported, 1)
+        self.assertEqual([number for number, message in errors], [2, 3, 4])
+
+    def test_non_utf8_csv(self):
+        with self.assertRaisesMessage(ValidationError, 'UTF-8'):
+            self.import_csv('بنر,چاپ پارس,1,1,1000,1,,\n', encoding='utf-16')
+
+    def test_undecodable_row_stops_the_import(self):
+        # سطر سوم با کدگذاری ویندوز (cp1256) ذخیره شده است
+        content = (self.header + 'بنر,چاپ پارس,1,1,1000,1,,\n').encode() + 'تابلو,,1,1,1000,1,,\n'.encode('cp1256')
+        imported, errors = import_orders(io.BytesIO(content), 'orders.csv')
+        self.assertEqual(imported, 1)
+        self.assertEqual([number for number, message in errors], [3])
+
+    def test_xlsx_that_is_not_a_zip_file(self):
+        with self.assertRaisesMessage(ValidationError, 'XLSX'):
+            import_orders(io.BytesIO(b'title\nbanner\n'), 'orders.xlsx')
+
+    def test_import_view_shows_unreadable_file_as_form_error(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        upload = SimpleUploadedFile('orders.csv', (self.header + 'بنر\n').encode('utf-16'))
+        response = self.client.post(reverse('admin:base_order_import'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('UTF-8', ' '.join(response.context['form'].errors['file']))
+
+
+class CompanyTotalsTestMixin:
+    def assertTotalsMatchOrders(self):
+        # همان محاسبه کامل refresh_company_totals و reconcile_totals
+        for company in Company.objects.all():
+            orders = Order.objects.filter(company_name=company)
+            costs = sum(order.total_cost for order in orders)
+            payments = sum(order.payment for order in orders)
+            self.assertEqual(
+                (company.total_orders, company.total_costs, company.total_payments, company.remaining_payments),
+                (len(orders), costs, payments, costs - payments), company.name,
+            )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CompanyTotalsTests(CompanyTotalsTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = Company.objects.create(name='شرکت اول', phone_number='02111111111')
+        cls.second = Company.objects.create(name='شرکت دوم', phone_number='02122222222')
+
+    def test_order_changes_update_company_totals(self):
+        order = Order.objects.create(title='بنر', company_name=self.first, width=1, height=1,
+                                     unit_cost=Decimal(1000), amount=2, payment=Decimal(500))
+        self.assertTotalsMatchOrders()
+        self.assertEqual(Company.objects.get(pk=self.first.pk).total_costs, 2000)
+
+        order.company_name, order.phone_number = self.second, None
+        order.save()
+        self.assertTotalsMatchOrders()
+
+        order.company_name, order.customer_name = None, 'مشتری'
+        order.save()
+        self.assertTotalsMatchOrders()
+
+        order.company_name, order.customer_name = self.first, None
+        order.save()
+        self.assertTotalsMatchOrders()
+
+        order.payment = Decimal(1500)
+        order.save()
+        self.assertTotalsMatchOrders()
+
+        order.amount = 3
+        order.save()
+        self.assertTotalsMatchOrders()
+        self.assertEqual(Company.objects.get(pk=self.first.pk).remaining_payments, 1500)
+
+        order.delete()
+        self.assertTotalsMatchOrders()
+        self.assertEqual(Company.objects.get(pk=self.first.pk).total_orders, 0)
+
+    def test_company_edit_keeps_the_totals(self):
+        company = Company.objects.get(pk=self.first.pk)
+        # سفارشی که پس از باز شدن فرم شرکت ثبت می‌شود
+        Order.objects.create(title='بنر', company_name=self.first, width=1, height=1, unit_cost=Decimal(1000))
+        company.name = 'شرکت اول (تهران)'
+        company.save()
+        self.assertTotalsMatchOrders()
+        self.assertEqual(Company.objects.get(pk=self.first.pk).name_search, 'شرکت اول (تهران)')
+
+    def test_order_without_company(self):
+        order = Order.objects.create(title='بنر', customer_name='مشتری', width=1, height=1, unit_cost=Decimal(10))
+        order.payment = Decimal(5)
+        order.save()
+        order.delete()
+        self.assertTotalsMatchOrders()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class DeferredCompanyTotalsTests(CompanyTotalsTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.companies = [Company.objects.create(name=f'شرکت {i}', phone_number=f'0211111111{i}') for i in range(2)]
+        cls.orders = [
+            Order.objects.create(title=f'بنر {i}', company_name=cls.companies[i % 2], width=1, height=1,
+                                 unit_cost=Decimal(1000), amount=1)
+            for i in range(6)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def company_updates(self, queries):
+        return [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "base_company"')]
+
+    def test_changelist_edits_update_each_company_once(self):
+        data = {'form-TOTAL_FORMS': len(self.orders), 'form-INITIAL_FORMS': len(self.orders), '_save': 'ذخیره'}
+        for i, order in enumerate(self.orders):
+            data.update({f'form-{i}-id': order.pk, f'form-{i}-payment': 400 + i})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('admin:base_order_changelist'), data)
+        self.assertEqual(response.status_code, 302)
+        # یک UPDATE گروهی برای هر دو شرکت، به جای یکی برای هر سفارش
+        self.assertEqual(len(self.company_updates(queries)), 1)
+        self.assertEqual(Company.objects.get(pk=self.companies[0].pk).total_payments, 400 + 402 + 404)
+        self.assertTotalsMatchOrders()
+
+    def test_bulk_delete_updates_each_company_once(self):
+        data = {'action': 'delete_selected', 'post': 'yes',
+                '_selected_action': [order.pk for order in self.orders[:4]]}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('admin:base_order_changelist'), data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(len(self.company_updates(queries)), 1)
+        self.assertTotalsMatchOrders()
+
+    def test_rollback_drops_deferred_totals(self):
+        order = self.orders[0]
+        with self.assertRaises(ZeroDivisionError):
+            with transaction.atomic(), deferred_company_totals():
+                order.payment = Decimal(900)
+                order.save()
+                1 / 0
+        self.assertTotalsMatchOrders()
+        # پس از خطا دیگر چیزی به تعویق نمی‌افتد
+        order.refresh_from_db()
+        order.payment = Decimal(300)
+        order.save()
+        self.assertEqual(Company.objects.get(pk=self.companies[0].pk).total_payments, 300)
+        self.assertTotalsMatchOrders()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ReconcileTotalsTests(CompanyTotalsTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='شرکت', phone_number='02111111111')
+        for i in range(3):
+            Order.objects.create(title=f'بنر {i}', company_name=cls.company, width=1, height=1,
+                                 unit_cost=Decimal(1000), amount=1, payment=Decimal(100))
+        cls.factor = Factor.objects.create(company=cls.company, total_cost=3000, total_payment=300)
+
+    def corrupt(self):
+        # بدون save و سیگنال‌ها، مثل ویرایش مستقیم پایگاه‌داده
+        Company.objects.filter(pk=self.company.pk).update(total_orders=5, total_costs=10, remaining_payments=0)
+        Factor.objects.filter(pk=self.factor.pk).update(total_remaining=1)
+
+    def reconcile(self, *args):
+        out = io.StringIO()
+        call_command('reconcile_totals', *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_reports_without_fixing(self):
+        self.corrupt()
+        output = self.reconcile('--dry-run')
+        self.assertIn('companies: 1 checked, 1 drifted', output)
+        self.assertIn('total_orders 5 -> 3', output)
+        self.assertIn('factors: 1 drifted', output)
+        self.assertEqual(Company.objects.get(pk=self.company.pk).total_orders, 5)
+        self.assertEqual(Factor.objects.get(pk=self.factor.pk).total_remaining, 1)
+
+    def test_drift_is_repaired(self):
+        self.corrupt()
+        output = self.reconcile()
+        self.assertIn('companies: 1 checked, 1 drifted', output)
+        self.assertTotalsMatchOrders()
+        self.assertEqual(Factor.objects.get(pk=self.factor.pk).total_remaining, 2700)
+        # دوباره اجرا: چیزی برای اصلاح نمانده است
+        output = self.reconcile()
+        self.assertIn('companies: 1 checked, 0 drifted', output)
+        self.assertIn('factors: 0 drifted', output)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CompanySearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        Company.objects.create(name='چاپ پارس')
+        Company.objects.create(name='پارس نو')
+        Company.objects.create(name='کیان', address='خیابان پارس')
+        Company.objects.create(name='آرش')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_prefix_matches_come_before_other_matches(self):
+        expected = ['پارس نو', 'چاپ پارس', 'کیان']
+        response = self.client.get(reverse('admin:base_company_changelist'), {'q': 'پارس'})
+        self.assertEqual([company.name for company in response.context['cl'].result_list], expected)
+
+        response = self.client.get(reverse('admin:base_company_choices'), {'term': 'پارس'})
+        self.assertEqual([result['text'] for result in response.json()['results']], expected)
+
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'term': 'پارس', 'app_label': 'base', 'model_name': 'order', 'field_name': 'company_name',
+        })
+        self.assertEqual([result['text'] for result in response.json()['results']], expected)
+
+    def test_chosen_ordering_is_kept(self):
+        response = self.client.get(reverse('admin:base_company_changelist'), {'q': 'پارس', 'o': '-1'})
+        self.assertEqual([company.name for company in response.context['cl'].result_list],
+                         ['کیان', 'چاپ پارس', 'پارس نو'])
+
+
+class OrderSearchTests(TestCase):
+    """The FTS index of orders and the triggers of migrations 0003/0004 that keep it in sync."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='چاپ پارس', phone_number='021-1234 5678')
+        cls.company_order = Order.objects.create(
+            title='کارت ویزیت', description='دو رو، گلاسه', company_name=cls.company, width=9, height=5,
+            unit_cost=Decimal(1000))
+        cls.customer_order = Order.objects.create(
+            title='بنر تبليغاتي', customer_name='علي كريمي', phone_number='۰۹۱۲۱۲۳۴۵۶۷', width=100, height=200,
+            unit_cost=Decimal(1000))
+
+    def search(self, term):
+        return sorted(order.title for order in search_orders(Order.objects.all(), term))
+
+    def test_name_phone_and_title(self):
+        self.assertEqual(self.search('ویزیت'), ['کارت ویزیت'])
+        self.assertEqual(self.search('گلاسه'), ['کارت ویزیت'])
+        self.assertEqual(self.search('پارس'), ['کارت ویزیت'])
+        self.assertEqual(self.search('علی'), ['بنر تبليغاتي'])
+        # partly typed words and numbers in any script
+        self.assertEqual(self.search('کار ویز'), ['کارت ویزیت'])
+        self.assertEqual(self.search('02112345'), ['کارت ویزیت'])
+        self.assertEqual(self.search('۰۹۱۲۱'), ['بنر تبليغاتي'])
+        self.assertEqual(self.search('کارت علی'), [])
+
+    def test_arabic_yeh_and_kaf(self):
+        # stored with Arabic ي/ك, searched with the Persian letters, and the other way round
+        self.assertEqual(self.search('تبلیغاتی کریمی'), ['بنر تبليغاتي'])
+        self.assertEqual(self.search('كارت ويزيت'), ['کارت ویزیت'])
+
+    def test_triggers_follow_order_changes(self):
+        order = Order.objects.create(title='تابلو', customer_name='رضا', width=1, height=1, unit_cost=Decimal(10))
+        self.assertEqual(self.search('تابلو'), ['تابلو'])
+
+        order.title, order.customer_name = 'استند', 'مریم'
+        order.save()
+        self.assertEqual(self.search('تابلو'), [])
+        self.assertEqual(self.search('رضا'), [])
+        self.assertEqual(self.search('استند مریم'), ['استند'])
+
+        order.customer_name, order.company_name = None, self.company
+        order.save()
+        self.assertEqual(self.search('استند پارس'), ['استند'])
+
+        order.delete()
+        self.assertEqual(self.search('استند'), [])
+
+    def test_company_rename_updates_its_orders(self):
+        self.company.name = 'چاپ نگار'
+        self.company.save()
+        self.assertEqual(self.search('پارس'), [])
+        self.assertEqual(self.search('نگار'), ['کارت ویزیت'])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CacheInvalidationTests(TestCase):
+    """Cached summaries and company choices are dropped once a change commits."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.company = Company.objects.create(name='چاپ پارس')
+
+    def setUp(self):
+        # LocMemCache keeps its entries across tests
+        cache.clear()
+
+    def summary(self):
+        return get_order_summary(Order.objects.all(), {}, '')['total_cost']
+
+    def test_order_changes_invalidate_the_summary(self):
+        self.assertEqual(self.summary(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(title='بنر', company_name=self.company, width=1, height=1,
+                                         unit_cost=Decimal(1000))
+        self.assertEqual(self.summary(), 1000)
+
+        order.amount = 3
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save()
+        self.assertEqual(self.summary(), 3000)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order.delete()
+        self.assertEqual(self.summary(), 0)
+
+    def test_company_save_invalidates_summaries_and_choices(self):
+        summary_key = order_summary_key({}, 'پارس')
+        choices_key = company_choices_key('پارس', 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.company.save()
+        self.assertNotEqual(order_summary_key({}, 'پارس'), summary_key)
+        self.assertNotEqual(company_choices_key('پارس', 1), choices_key)
+
+    def test_company_choices_show_new_and_renamed_companies(self):
+        self.client.force_login(self.user)
+        url = reverse('admin:base_company_choices')
+
+        def choices():
+            return [result['text'] for result in self.client.get(url, {'term': 'پارس'}).json()['results']]
+
+        self.assertEqual(choices(), ['چاپ پارس'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Company.objects.create(name='پارس نو')
+        self.assertEqual(choices(), ['پارس نو', 'چاپ پارس'])
+
+        self.company.name = 'چاپ نگار'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.company.save()
+        self.assertEqual(choices(), ['پارس نو'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Company.objects.get(name='پارس نو').delete()
+        self.assertEqual(choices(), [])
+
+
+class OrderExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        company = Company.objects.create(name='چاپ پارس')
+        Order.objects.bulk_create([
+            Order(title=f'بنر {i}', company_name=company if i % 2 else None,
+                  customer_name=None if i % 2 else f'مشتری {i}', width=1, height=1,
+                  unit_cost=Decimal(1000), total_cost=Decimal(1000), payment=Decimal(400),
+                  remaining_payment=Decimal(600), order_date=jdatetime.datetime(1403, 1, 20, 10, 30, i))
+            for i in range(12)
+        ])
+
+    def test_csv_streams_every_chunk(self):
+        with mock.patch.object(utils, 'ORDER_EXPORT_CHUNK_SIZE', 5):
+            response = utils.export_orders_csv(None, None, Order.objects.order_by('id'))
+            chunks = list(response.streaming_content)
+        # the header with the first chunk, then one chunk per 5 rows
+        self.assertEqual(len(chunks), 3)
+        rows = list(csv.reader(io.StringIO(b''.join(chunks).decode('utf-8-sig'))))
+        self.assertEqual(rows[0], utils.ORDER_EXPORT_HEADERS)
+        self.assertEqual(len(rows), 13)
+        self.assertEqual(rows[1][:4], ['بنر 0', '', 'مشتری 0', 'مشتری 0'])
+        self.assertEqual(rows[2][2:4], ['', 'چاپ پارس'])
+        self.assertEqual([row[-1] for row in rows[1:3]], ['1403/01/20 10:30:00', '1403/01/20 10:30:01'])
+        self.assertEqual(rows[12][-1], '1403/01/20 10:30:11')
+
+    def test_xlsx_workbook(self):
+        response = utils.export_orders_xlsx(None, None, Order.objects.order_by('id'))
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as zf:
+            self.assertIsNone(zf.testzip())
+            workbook = ElementTree.fromstring(zf.read('xl/workbook.xml'))
+            sheet = ElementTree.fromstring(zf.read('xl/worksheets/sheet1.xml'))
+        self.assertEqual(workbook.find(f'.//{XLSX_NS}sheet').get('name'), 'سفارشات')
+
+        def value(cell):
+            if cell.get('t') == 'inlineStr':
+                return ''.join(t.text or '' for t in cell.iter(f'{XLSX_NS}t'))
+            return cell.findtext(f'{XLSX_NS}v')
+
+        rows = [[value(cell) for cell in row] for row in sheet.iter(f'{XLSX_NS}row')]
+        self.assertEqual(rows[0], utils.ORDER_XLSX_HEADERS)
+        self.assertEqual(rows[0][:-1], utils.ORDER_EXPORT_HEADERS)
+        self.assertEqual(len(rows), 13)
+        self.assertEqual(rows[1][:4], ['بنر 0', None, 'مشتری 0', 'مشتری 0'])
+        self.assertEqual(rows[2][3], 'چاپ پارس')
+        self.assertEqual(rows[1][8:], ['در حال انتظار', '1403/01/20 10:30:00', '14030120103000'])
+        # the sort key is a number, so Excel sorts the Jalali dates in order
+        sort_keys = [row[-1] for row in sheet.iter(f'{XLSX_NS}row')][1:]
+        self.assertTrue(all(cell.get('t') is None for cell in sort_keys))
+        self.assertEqual([int(row[-1]) for row in rows[1:]], [14030120103000 + i for i in range(12)])
+
+
+class FactorJobPermissionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.job = FactorJob.objects.create(order_ids=[], status=FactorJob.DONE, file_name='factor.pdf')
+
+    def test_staff_without_permission_cannot_poll_or_download(self):
+        self.client.force_login(User.objects.create_user('clerk', password='password', is_staff=True))
+        for name in ('admin:base_factorjob_progress', 'admin:base_factorjob_download'):
+            self.assertEqual(self.client.get(reverse(name, args=[self.job.pk])).status_code, 403, name)
+
+    def test_permitted_user_can_poll(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        response = self.client.get(reverse('admin:base_factorjob_progress', args=[self.job.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['download_url'], reverse('admin:base_factorjob_download', args=[self.job.pk]))
+
+
+class FactorPdfTests(TestCase):
+    def test_pages_of_one_customer_are_streamed_as_they_end(self):
+        company = Company.objects.create(name='شرکت بزرگ', phone_number='02112345678')
+        factor = Factor.objects.create(company=company)
+        read = []
+
+        def orders():
+            for i in range(ROWS_PER_PAGE * 3):
+                read.append(i)
+                yield Order(title=f'سفارش {i}', company_name=company, width=1, height=1, amount=1,
+                            unit_cost=Decimal(10), total_cost=Decimal(10), payment=0, remaining_payment=Decimal(10))
+
+        chunks = stream_factor_pdf([(factor, orders())])
+        first = next(chunks)
+        self.assertTrue(first.startswith(b'%PDF'))
+        # صفحه اول پیش از خواندن صفحه سوم سفارش‌ها فرستاده شده است
+        self.assertLessEqual(len(read), ROWS_PER_PAGE * 2)
+        pages = [first] + [chunk for chunk in chunks if chunk]
+        self.assertGreaterEqual(len(pages), 3)
+        self.assertTrue(pages[-1].rstrip().endswith(b'%%EOF'))
+
+    def test_job_progress_counts_factors(self):
+        company = Company.objects.create(name='شرکت بزرگ')
+        # سه صفحه برای شرکت و یک صفحه برای هر مشتری
+        for i in range(ROWS_PER_PAGE * 3):
+            Order.objects.create(title=f'سفارش {i}', company_name=company, width=1, height=1, unit_cost=Decimal(10))
+        for name in ('مشتری ۱', 'مشتری ۲'):
+            Order.objects.create(title='بنر', customer_name=name, width=1, height=1, unit_cost=Decimal(10))
+        job = FactorJob.objects.create(order_ids=list(Order.objects.values_list('id', flat=True)))
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        with override_settings(FACTOR_JOB_DIR=directory, FACTOR_PDF_CACHE_MAX_SIZE=0), \
+                mock.patch.object(jobs, 'FACTOR_JOB_PROGRESS_INTERVAL', 0), \
+                mock.patch.object(jobs, 'update_factor_job', wraps=jobs.update_factor_job) as update:
+            self.assertTrue(jobs.run_factor_job(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.total, job.progress), (FactorJob.DONE, 3, 3))
+        progress = [call.kwargs['progress'] for call in update.call_args_list if 'progress' in call.kwargs]
+        self.assertEqual(progress, [1, 2, 3, 3])
+
+
+class SerializedWriteTests(unittest.TestCase):
+    """
+    base.sqlite on a database file of its own; the in-memory test database
+    has no write lock. A plain TestCase, as Django's test cases only allow
+    the test database.
+    """
+
+    alias = 'serialized_writes'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.directory, 'db.sqlite3')
+        connections.databases[cls.alias] = {
+            **connections.databases['default'], 'ENGINE': 'base.sqlite', 'NAME': cls.path,
+            'OPTIONS': {**settings.SQLITE_WAL_OPTIONS, 'timeout': 0.1},
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[cls.alias].close()
+        del connections[cls.alias]
+        del connections.databases[cls.alias]
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        self.execute('DROP TABLE IF EXISTS item')
+        self.execute('CREATE TABLE item (id INTEGER PRIMARY KEY, name TEXT)')
+
+    def execute(self, sql, params=None):
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def lock_is_free(self):
+        # قفل بازگشتی است؛ از نخ دیگری امتحان می‌شود
+        free = []
+
+        def try_lock():
+            free.append(self.write_lock.acquire(timeout=0))
+            if free[0]:
+                self.write_lock.release()
+
+        thread = threading.Thread(target=try_lock)
+        thread.start()
+        thread.join()
+        return free[0]
+
+    @property
+    def write_lock(self):
+        return write_locks[self.path]
+
+    def test_concurrent_writers(self):
+        errors = []
+
+        def writer(name):
+            try:
+                for i in range(20):
+                    with transaction.atomic(using=self.alias):
+                        # خواندن پیش از نوشتن، مثل ذخیره در مدیریت
+                        self.execute('SELECT COUNT(*) FROM item')
+                        self.execute('INSERT INTO item (name) VALUES (%s)', [f'{name} {i}'])
+            except OperationalError as e:
+                errors.append(e)
+            finally:
+                connections[self.alias].close()
+
+        threads = [threading.Thread(target=writer, args=(name,)) for name in ('a', 'b')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(self.execute('SELECT COUNT(*) FROM item'), [(40,)])
+
+    def test_locked_write_is_retried(self):
+        # پروسه دیگری (مثل سازنده فاکتور) قفل فایل را دارد تا اولین تأخیر تلاش دوباره
+        other = sqlite3.connect(self.path, isolation_level=None)
+        self.addCleanup(other.close)
+        other.execute('BEGIN IMMEDIATE')
+        delays = []
+
+        def sleep(delay):
+            delays.append(delay)
+            other.execute('COMMIT')
+
+        with mock.patch('base.sqlite.base.time.sleep', sleep):
+            self.execute('INSERT INTO item (name) VALUES (%s)', ['retried'])
+        self.assertEqual(len(delays), 1)
+        self.assertEqual(self.execute('SELECT name FROM item'), [('retried',)])
+        self.assertTrue(self.lock_is_free())
+
+    def test_rollback_releases_the_lock(self):
+        with self.assertRaises(ZeroDivisionError):
+            with transaction.atomic(using=self.alias):
+                self.execute('INSERT INTO item (name) VALUES (%s)', ['rolled back'])
+                self.assertFalse(self.lock_is_free())
+                1 / 0
+        self.assertTrue(self.lock_is_free())
+        self.assertEqual(self.execute('SELECT COUNT(*) FROM item'), [(0,)])
+
+    def test_deferred_transaction_locks_at_first_write(self):
+        with deferred_transactions(), transaction.atomic(using=self.alias):
+            self.execute('SELECT COUNT(*) FROM item')
+            self.assertTrue(self.lock_is_free())
+            self.execute('INSERT INTO item (name) VALUES (%s)', ['deferred'])
+            self.assertFalse(self.lock_is_free())
+        self.assertTrue(self.lock_is_free())
+
+    def test_get_requests_begin_deferred(self):
+        seen = []
+        middleware = DeferredTransactionsMiddleware(lambda request: seen.append(getattr(deferred_state, 'active', False)))
+        middleware(RequestFactory().get('/admin/base/order/1/change/'))
+        middleware(RequestFactory().post('/admin/base/order/1/change/'))
+        self.assertEqual(seen, [True, False])
+
+    def test_immediate_transaction_locks_at_begin(self):
+        with transaction.atomic(using=self.alias):
+            self.execute('SELECT COUNT(*) FROM item')
+            self.assertFalse(self.lock_is_free())
+        self.assertTrue(self.lock_is_free())
+
+
+class StartupTests(TestCase):
+    def test_no_pending_migrations_after_migrate(self):
+        # the test database is migrated, so a launch would skip migrate
+        self.assertEqual(pending_migrations(), set())
+
+    def test_unapplied_migration_is_pending(self):
+        MigrationRecorder(connection).record_unapplied('base', '0001_initial')
+        self.assertEqual(pending_migrations(), {('base', '0001_initial')})
@@ -1,73 +1,184 @@
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse, FileResponse
 import csv
 import os
-from io import BytesIO
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from io import BytesIO, StringIO
+from itertools import groupby, islice
+from tempfile import TemporaryFile
+from pypdf import PdfReader, PdfWriter
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
 from reportlab.lib.colors import CMYKColor
-from reportlab.platypus import Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_RIGHT, TA_CENTER
 from reportlab.lib import colors
 from django.http import HttpResponse
 from django.conf import settings
 from django.utils.html import format_html
 from django.contrib import messages
-from django.contrib import messages
 from django.shortcuts import redirect
+from django.db import transaction
+from django.db.models import Count, Sum
 # Import for Farsi/Arabic RTL support
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from arabic_reshaper import ArabicReshaper
 from bidi.algorithm import get_display
 from num2fawords import words
-from collections import defaultdict
 from jdatetime import datetime
-from base.models import Factor
-
+from base.models import COMPANY_TOTAL_FIELDS, Company, Order, Factor, FactorJob
+from base.cache import (
+    factor_cache_enabled, factor_content_hasher, factor_cache_path, get_cached_factor_pdf,
+    open_factor_cache_entry, commit_factor_cache_entry, discard_factor_cache_entry, cache_factor_pdf,
+)
+from base.streaming import StreamingCanvas
+from base.xlsx import stream_xlsx
+from base.workers import init_django_worker
+
+
+
+# --- Company totals ---
+
+def refresh_company_totals(company_ids):
+    """
+    Recompute the order totals of the companies in `company_ids` with one
+    grouped aggregate query and write them back with one bulk update.
+    """
+    company_ids = set(company_ids) - {None}
+    if not company_ids:
+        return
+    totals = {
+        row['company_name']: row
+        for row in Order.objects.filter(company_name__in=company_ids).values('company_name').annotate(
+            count=Count('id'), costs=Sum('total_cost'), payments=Sum('payment'),
+        ).order_by()
+    }
+    companies = list(Company.objects.filter(id__in=company_ids))
+    for company in companies:
+        row = totals.get(company.id, {})
+        company.total_orders = row.get('count', 0)
+        company.total_costs = row.get('costs') or 0
+        company.total_payments = row.get('payments') or 0
+        company.remaining_payments = company.total_costs - company.total_payments
+    Company.objects.bulk_update(companies, COMPANY_TOTAL_FIELDS, batch_size=500)
 
 
 # Export CSV Action
+ORDER_EXPORT_CHUNK_SIZE = 2000
+
+ORDER_EXPORT_FIELDS = (
+    'title', 'description', 'customer_name', 'company_name__name', 'unit_cost', 'total_cost',
+    'payment', 'remaining_payment', 'order_status', 'order_date',
+)
+
+# Persian Headers
+ORDER_EXPORT_HEADERS = [
+    'عنوان سفارش',
+    'توضیحات',
+    'نام مشتری',
+    'نام شرکت',
+    'قیمت واحد',
+    'قیمت کل',
+    'مبلغ پرداختی',
+    'پرداخت باقی‌مانده',
+    'وضعیت سفارش',
+    'تاریخ ایجاد'
+]
+
+
+def format_jalali_datetime(value):
+    # همان خروجی strftime('%Y/%m/%d %H:%M:%S')، بدون هزینه strftime در jdatetime
+    return (f'{value.year:04d}/{value.month:02d}/{value.day:02d} '
+            f'{value.hour:02d}:{value.minute:02d}:{value.second:02d}')
+
+
+def iter_order_export_rows(queryset):
+    """
+    Yield the ORDER_EXPORT_FIELDS of `queryset` in chunks (lists of tuples).
+    Rows are read joined to Company in one query, so memory and the number
+    of queries do not grow with the number of orders.
+    """
+    rows = queryset.values_list(*ORDER_EXPORT_FIELDS).iterator(chunk_size=ORDER_EXPORT_CHUNK_SIZE)
+    return iter(lambda: list(islice(rows, ORDER_EXPORT_CHUNK_SIZE)), [])
+
+
+def iter_orders_csv(chunks):
+    """Yield the CSV export of the row `chunks` one encoded chunk at a time."""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+
+    buffer.write('\ufeff') # BOM for UTF-8 in Excel
+    writer.writerow(ORDER_EXPORT_HEADERS)
+
+    for chunk in chunks:
+        for (title, description, customer_name, company_name, unit_cost, total_cost,
+             payment, remaining_payment, order_status, order_date) in chunk:
+            writer.writerow([
+                title,
+                description,
+                customer_name,
+                company_name or customer_name,
+                unit_cost,
+                total_cost,
+                payment,
+                remaining_payment,
+                'تکمیل شده' if order_status else 'در حال انتظار',
+                format_jalali_datetime(order_date) # Format Jalali date for CSV
+            ])
+        yield buffer.getvalue().encode('utf8')
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf8')
+
+
 def export_orders_csv(modeladmin, request, queryset):
-    response = HttpResponse(content_type='text/csv')
+    response = StreamingHttpResponse(iter_orders_csv(iter_order_export_rows(queryset)), content_type='text/csv')
     response['Content-Disposition'] = 'attachment; filename="orders.csv"'
-    response.write(u'\ufeff'.encode('utf8')) # BOM for UTF-8 in Excel
-
-    writer = csv.writer(response)
-    
-    # Persian Headers
-    writer.writerow([
-        'عنوان سفارش',
-        'توضیحات',
-        'نام مشتری',
-        'نام شرکت',
-        'قیمت واحد',
-        'قیمت کل',
-        'مبلغ پرداختی',
-        'پرداخت باقی‌مانده',
-        'وضعیت سفارش',
-        'تاریخ ایجاد'
-    ])
-
-    for order in queryset:
-        customer_info = order.company_name.name if order.company_name else order.customer_name
-        writer.writerow([
-            order.title,
-            order.description,
-            order.customer_name,
-            customer_info,
-            order.unit_cost,
-            order.total_cost,
-            order.payment,
-            order.remaining_payment,
-            'تکمیل شده' if order.order_status else 'در حال انتظار',
-            order.order_date.strftime('%Y/%m/%d %H:%M:%S') # Format Jalali date for CSV
-        ])
     return response
 
 export_orders_csv.short_description = "خروجی CSV از سفارشات انتخاب شده"
 
+
+# Export XLSX Action
+ORDER_XLSX_HEADERS = ORDER_EXPORT_HEADERS + ['کلید مرتب‌سازی تاریخ']
+ORDER_XLSX_COL_WIDTHS = [30, 40, 20, 25, 15, 15, 15, 15, 15, 20, 18]
+
+
+def iter_order_xlsx_rows(chunks):
+    for chunk in chunks:
+        for (title, description, customer_name, company_name, unit_cost, total_cost,
+             payment, remaining_payment, order_status, order_date) in chunk:
+            yield (
+                title,
+                description,
+                customer_name,
+                company_name or customer_name,
+                unit_cost,
+                total_cost,
+                payment,
+                remaining_payment,
+                'تکمیل شده' if order_status else 'در حال انتظار',
+                format_jalali_datetime(order_date),
+                # تاریخ شمسی به صورت عدد YYYYMMDDHHMMSS تا مرتب‌سازی در اکسل درست باشد
+                ((order_date.year * 100 + order_date.month) * 100 + order_date.day) * 1000000
+                + (order_date.hour * 100 + order_date.minute) * 100 + order_date.second,
+            )
+
+
+def export_orders_xlsx(modeladmin, request, queryset):
+    chunks = stream_xlsx(ORDER_XLSX_HEADERS, iter_order_xlsx_rows(iter_order_export_rows(queryset)),
+                         sheet_name='سفارشات', col_widths=ORDER_XLSX_COL_WIDTHS)
+    response = StreamingHttpResponse(
+        chunks, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    response['Content-Disposition'] = 'attachment; filename="orders.xlsx"'
+    return response
+
+export_orders_xlsx.short_description = "خروجی اکسل از سفارشات انتخاب شده"
+
 # --- Farsi Font & Reshaper Configuration ---
 # مسیر دقیق فایل فونت TTF شما.
 # مطمئن شوید که IRANSansX-Black.ttf در پوشه static/fonts/ پروژه شما وجود دارد.
@@ -111,6 +222,20 @@ def generate_safe_filename(factor_ids):
     return f"factor_{id_str}_{date_str}.pdf"
 
 
+FARSI_TEXT_CACHE_SIZE = 4096
+FARSI_DIGITS = str.maketrans("0123456789", "۰۱۲۳۴۵۶۷۸۹")
+
+
+@lru_cache(maxsize=FARSI_TEXT_CACHE_SIZE)
+def shape_farsi_text(text):
+    """
+    Reshape and reorder `text` for drawing. Memoized, as the same labels,
+    names and amounts repeat on every page; hits and misses are reported by
+    shape_farsi_text.cache_info().
+    """
+    return get_display(global_reshaper.reshape(convert_to_farsi_numbers(text)))
+
+
 def get_farsi_text(text):
     if not global_font_registered or global_reshaper is None:
         return str(text) if text is not None else ''
@@ -122,15 +247,11 @@ def get_farsi_text(text):
     if not text.strip():
         return ''
 
-    text = convert_to_farsi_numbers(text)
-
-    reshaped_text = global_reshaper.reshape(text)
-    return get_display(reshaped_text)
+    return shape_farsi_text(text)
 
 
 def convert_to_farsi_numbers(text):
-    en_to_fa = str.maketrans("0123456789", "۰۱۲۳۴۵۶۷۸۹")
-    return text.translate(en_to_fa)
+    return text.translate(FARSI_DIGITS)
 
 
 # --- Helper to draw CMYK circles ---
@@ -148,244 +269,446 @@ def draw_cmyk_circles(canvas_obj, x, y, radius):
         canvas_obj.circle(x + i * spacing, y, radius, fill=1) # fill=1 یعنی پر کردن دایره
 
 
-# --- Django Admin Action ---
-
-def generate_factor_pdf(modeladmin, request, queryset):
-    if not global_font_registered:
-        messages.error(request, "تولید PDF ناموفق: فونت فارسی به درستی بارگذاری نشده است. لطفاً گزارشات سرور را بررسی کنید.")
-        return HttpResponse("خطا: فونت فارسی بارگذاری نشده است.", status=500)
+# --- Factor page layout (A4) ---
+PAGE_WIDTH, PAGE_HEIGHT = A4
+HEADER_Y = PAGE_HEIGHT - 20 * mm
+INFO_Y = HEADER_Y - 20 * mm
+INFO_LINE_SPACING = 7 * mm
+TABLE_Y = INFO_Y - 2.5 * INFO_LINE_SPACING - 5 * mm  # شروع جدول
+TABLE_ROW_HEIGHT = 8 * mm  # ارتفاع هر ردیف
+TABLE_COL_WIDTHS = list(reversed([
+    10 * mm,   # ردیف
+    45 * mm,   # عنوان
+    25 * mm,   # ابعاد
+    15 * mm,   # تعداد
+    28 * mm,   # مبلغ واحد
+    28 * mm,   # مبلغ کل
+    28 * mm,   # پرداختی
+    28 * mm,   # باقیمانده
+]))
+TABLE_HEADER_LABELS = [
+    "ردیف",
+    "عنوان",
+    "ابعاد",
+    "تعداد",
+    "مبلغ واحد به ریال",
+    "مبلغ کل به ریال",
+    "مبلغ پرداختی به ریال",
+    "مبلغ باقیمانده به ریال",
+]
+TOTALS_LINE_HEIGHT = 7 * mm
+TOTALS_BLOCK_SPACING = 2 * mm
+TOTALS_HEIGHT = 10 * mm + 5 * TOTALS_LINE_HEIGHT + 2 * TOTALS_BLOCK_SPACING
+FOOTER_LINES = [
+    "تلفن: 061111111",
+    "شماره شبا: IR00000000000000000000",
+    "شماره کارت: 0000-0000-0000-0000",
+    "بنام: شرکت ایده نو",
+]
+FOOTER_Y = 40 * mm  # اولین خط اطلاعات تماس
+FOOTER_LINE_SPACING = 6 * mm
+FOOTER_TOP = FOOTER_Y + 8 * mm
+
+# number of order rows that fit under the table header on a page, and on the
+# last page of a factor where the totals block has to fit under the table too
+ROWS_PER_PAGE = int((TABLE_Y - FOOTER_TOP) // TABLE_ROW_HEIGHT) - 1
+ROWS_ON_LAST_PAGE = int((TABLE_Y - FOOTER_TOP - TOTALS_HEIGHT) // TABLE_ROW_HEIGHT) - 1
+
+# متن‌های ثابت فاکتور فقط یک بار شکل‌دهی می‌شوند
+MAIN_TITLE_TEXT = get_farsi_text("کانون تبلیغاتی فرهنگی هنری")
+DATE_PLACEHOLDER_TEXT = get_farsi_text("تاریخ: __/__/__14")
+FOOTER_TEXTS = [get_farsi_text(line) for line in FOOTER_LINES]
+
+TABLE_FONT_SIZE = 9  # کمی کوچکتر برای جدول
+TABLE_LEADING = 11
+TABLE_CELL_PADDING = 2
+TABLE_HEADER_BACKGROUND = colors.Color(0.9, 0.9, 0.9)
+TABLE_WIDTH = sum(TABLE_COL_WIDTHS)
+TABLE_X = (PAGE_WIDTH - TABLE_WIDTH) / 2
+TABLE_COL_XS = [TABLE_X + sum(TABLE_COL_WIDTHS[:i]) for i in range(len(TABLE_COL_WIDTHS) + 1)]
+
+
+@lru_cache(maxsize=FARSI_TEXT_CACHE_SIZE)
+def wrap_farsi_text(text, width, font_size=TABLE_FONT_SIZE):
+    """
+    Split `text` into shaped lines no wider than `width`. Lines are broken
+    on the logical text, so the first words stay on the first line.
+    """
+    shaped = get_farsi_text(text)
+    if pdfmetrics.stringWidth(shaped, 'IranSans', font_size) <= width:
+        return (shaped,)
+
+    lines = []
+    line = []
+    for word in text.split():
+        if line and pdfmetrics.stringWidth(get_farsi_text(' '.join(line + [word])), 'IranSans', font_size) > width:
+            lines.append(get_farsi_text(' '.join(line)))
+            line = []
+        line.append(word)
+    lines.append(get_farsi_text(' '.join(line)))
+    return tuple(lines)
+
+
+def draw_table_row(p, cells, row_top):
+    """Draw one row of (logical, right-to-left) cell texts centred in the fixed columns."""
+    middle = row_top - TABLE_ROW_HEIGHT / 2
+    for x, width, text in zip(TABLE_COL_XS, TABLE_COL_WIDTHS, reversed(cells)):
+        lines = wrap_farsi_text(text, width - 2 * TABLE_CELL_PADDING)
+        baseline = middle + (len(lines) - 1) * TABLE_LEADING / 2 - TABLE_FONT_SIZE * 0.3
+        for line in lines:
+            p.drawCentredString(x + width / 2, baseline, line)
+            baseline -= TABLE_LEADING
+
+
+def order_customer_key(order):
+    # سفارش‌های یک شرکت یا یک مشتری (بدون شرکت) در یک فاکتور قرار می‌گیرند
+    if order.company_name_id:
+        return (order.company_name_id, None)
+    return (None, order.customer_name)
+
+
+FACTOR_TEMPLATE_FORM = 'factor_template'
+
+
+def draw_factor_template(p):
+    """Draw the parts that are the same on every factor page."""
+    # کانون تبلیغاتی... (عنوان اصلی)
+    p.setFont("IranSans", 16)
+    text_width = p.stringWidth(MAIN_TITLE_TEXT, "IranSans", 16)
+    p.drawString((PAGE_WIDTH - text_width) / 2, HEADER_Y, MAIN_TITLE_TEXT)
+
+    # دایره‌های CMYK (جایگذاری تقریبی)
+    draw_cmyk_circles(p, (PAGE_WIDTH - text_width) / 2 - 25*mm, HEADER_Y + 5*mm, 3*mm)
+
+    p.setFillColor(colors.black)
+    p.setFont("IranSans", 10)
+    p.drawString(20 * mm, INFO_Y - INFO_LINE_SPACING, DATE_PLACEHOLDER_TEXT)
+
+    # --- خطوط افقی جداکننده هدر ---
+    p.line(15 * mm, HEADER_Y - 10 * mm, PAGE_WIDTH - 15 * mm, HEADER_Y - 10 * mm)  # خط زیر عنوان اصلی
+    p.line(15 * mm, INFO_Y - 2.5 * INFO_LINE_SPACING, PAGE_WIDTH - 15 * mm, INFO_Y - 2.5 * INFO_LINE_SPACING)  # خط زیر اطلاعات عمومی
+
+    p.setFont("IranSans", 9)
+
+    # اطلاعات تماس
+    for i, text in enumerate(FOOTER_TEXTS):
+        p.drawString(20 * mm, FOOTER_Y - i * FOOTER_LINE_SPACING, text)
+
+    # نوار مشکی پایین صفحه
+    p.setStrokeColor(colors.black)
+    p.rect(15 * mm, 15 * mm, PAGE_WIDTH - 30 * mm, 0.2 * mm, fill=1)
+
+
+def draw_factor_header(p, factor, customer_display_name, phone_number):
+    # بخش‌های ثابت صفحه یک بار در هر سند ساخته و روی هر صفحه تکرار می‌شوند
+    if not p.hasForm(FACTOR_TEMPLATE_FORM):
+        p.beginForm(FACTOR_TEMPLATE_FORM)
+        draw_factor_template(p)
+        p.endForm()
+    p.doForm(FACTOR_TEMPLATE_FORM)
+
+    # --- اطلاعات عمومی فاکتور  ---
+    p.setFont("IranSans", 10)
+    info_x_right = PAGE_WIDTH - 20 * mm  # سمت راست
+    info_x_left = 20 * mm          # سمت چپ
+
+    # ردیف اول: مشتری - شماره فاکتور
+    p.drawRightString(info_x_right, INFO_Y, get_farsi_text(f"مشتری: {customer_display_name}"))
+    p.drawString(info_x_left, INFO_Y, get_farsi_text(f"شماره: {factor.id}"))
+
+    # ردیف دوم: شماره تلفن
+    p.drawRightString(info_x_right, INFO_Y - INFO_LINE_SPACING, get_farsi_text(f"شماره تلفن: {phone_number}"))
+
+
+def draw_factor_table(p, orders, first_row_number):
+    """Draw the orders table under the page header and return its bottom y."""
+    table_bottom = TABLE_Y - (len(orders) + 1) * TABLE_ROW_HEIGHT
+
+    # سربرگ جدول
+    p.setFillColor(TABLE_HEADER_BACKGROUND)
+    p.rect(TABLE_X, TABLE_Y - TABLE_ROW_HEIGHT, TABLE_WIDTH, TABLE_ROW_HEIGHT, stroke=0, fill=1)
+    p.setFillColor(colors.black)
+    p.setFont("IranSans", TABLE_FONT_SIZE)
+    draw_table_row(p, TABLE_HEADER_LABELS, TABLE_Y)
+
+    row_top = TABLE_Y - TABLE_ROW_HEIGHT
+    for i, order in enumerate(orders, start=first_row_number):
+        draw_table_row(p, [
+            str(i),
+            order.title or '',
+            f"{order.width} * {order.height}",
+            str(order.amount),
+            f'{order.unit_cost:,.0f}',
+            f'{order.total_cost:,.0f}',
+            f'{order.payment:,.0f}',
+            f'{order.remaining_payment:,.0f}',
+        ], row_top)
+        row_top -= TABLE_ROW_HEIGHT
+
+    p.setStrokeColor(colors.black)
+    p.setLineWidth(0.5)
+    p.grid(TABLE_COL_XS, [TABLE_Y - i * TABLE_ROW_HEIGHT for i in range(len(orders) + 2)])
+    p.setLineWidth(1)
+    return table_bottom
+
+
+def draw_factor_totals(p, y, total_sum, total_payment, total_remaining):
+    p.setFont("IranSans", 10)
+
+    # موقعیت راست صفحه
+    total_x_right = PAGE_WIDTH - 10 * mm
+    footer_y = y - 10 * mm
+
+    # --- جمع کل ---
+    p.drawRightString(total_x_right, footer_y, get_farsi_text(f"جمع کل: {total_sum:,.0f} ریال"))
+    p.drawRightString(total_x_right, footer_y - TOTALS_LINE_HEIGHT, get_farsi_text(f"مبلغ به حروف: {words(total_sum)} ریال"))
+
+    # --- پرداختی ---
+    footer_y -= 2 * TOTALS_LINE_HEIGHT + TOTALS_BLOCK_SPACING
+    p.drawRightString(total_x_right, footer_y, get_farsi_text(f"جمع کل پرداختی: {total_payment:,.0f} ریال"))
+    p.drawRightString(total_x_right, footer_y - TOTALS_LINE_HEIGHT, get_farsi_text(f"مبلغ به حروف: {words(total_payment)} ریال"))
+
+    # --- باقیمانده ---
+    footer_y -= 2 * TOTALS_LINE_HEIGHT + TOTALS_BLOCK_SPACING
+    p.drawRightString(total_x_right, footer_y, get_farsi_text(f"جمع کل بدهی باقیمانده: {total_remaining:,.0f} ریال"))
+    p.drawRightString(total_x_right, footer_y - TOTALS_LINE_HEIGHT, get_farsi_text(f"مبلغ به حروف: {words(total_remaining)} ریال"))
+
+
+def draw_factor(p, factor, orders):
+    """
+    Draw one customer's factor. The table continues over as many pages as the
+    orders need; the totals go under the table on the last page, which is
+    left open for the caller to end. A generator: it yields after each page
+    it ends, so a streaming canvas can send that page before the next one is
+    drawn, and returns the (total_cost, total_payment, total_remaining) sums
+    of the drawn orders.
+    """
+    orders = iter(orders)
+    page_orders = list(islice(orders, ROWS_PER_PAGE))
+    customer = page_orders[0].company_name or page_orders[0].customer_name or 'نامشخص'
+    customer_display_name = customer.name if hasattr(customer, 'name') else customer
+    phone_number = getattr(customer, 'phone_number', None) or '_'
+
+    total_sum = 0
+    total_payment = 0
+    total_remaining = 0
+    row_number = 1
+    while True:
+        next_orders = list(islice(orders, ROWS_PER_PAGE))
+
+        draw_factor_header(p, factor, customer_display_name, phone_number)
+        table_bottom = draw_factor_table(p, page_orders, row_number)
+
+        for order in page_orders:
+            total_sum += order.total_cost
+            total_remaining += order.remaining_payment
+            total_payment += order.payment
+        row_number += len(page_orders)
 
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
+        if next_orders:
+            p.showPage()
+            yield
+            page_orders = next_orders
+            continue
 
-    grouped_orders = defaultdict(list)
-    
-    # استایل‌های ReportLab Platypus
-    styles = getSampleStyleSheet()
-    # استایل برای پاراگراف‌های فارسی (به ویژه در جدول و توضیحات فوتر)
-    farsi_paragraph_style_table = ParagraphStyle(name='FarsiParagraphTable',
-                                                fontName='IranSans',
-                                                fontSize=9, # کمی کوچکتر برای جدول
-                                                alignment=TA_CENTER,
-                                                leading=11)
-
-
-    for order in queryset:
-        key = order.company_name or order.customer_name or 'نامشخص'
-        grouped_orders[key].append(order)
-
-    # بررسی تعداد سفارش‌ها برای هر مشتری
-
-    for key, orders in grouped_orders.items():
-        if len(orders) > 16:
-            messages.error(request, f"مشتری '{key}' بیش از ۱۶ سفارش دارد و نمی‌توان فاکتور ساخت.")
-            return redirect(request.get_full_path())
-        
-    n = 0
-    factor_ids = []
-    for customer, orders in grouped_orders.items():
-        
-        if n != 0:
+        if len(page_orders) > ROWS_ON_LAST_PAGE:
+            # جمع‌ها زیر جدول جا نمی‌شوند
             p.showPage()
-        n += 1
-        
-        # تنظیم فونت اصلی صفحه
-        p.setFont("IranSans", 10)
-
-        # --- ناحیه هدر ---
-        header_y_start = height - 20*mm
-        # فاکتور غیرقابل تغییر
-        p.setFont("IranSans", 10)
-
-        # کانون تبلیغاتی... (عنوان اصلی)
-        p.setFont("IranSans", 16)
-        main_title_text = get_farsi_text("کانون تبلیغاتی فرهنگی هنری")
-        text_width = p.stringWidth(main_title_text, "IranSans", 16)
-        p.drawString((width - text_width) / 2, header_y_start, main_title_text)
-
-        # دایره‌های CMYK (جایگذاری تقریبی)
-        draw_cmyk_circles(p, (width - text_width) / 2 - 25*mm, header_y_start + 5*mm, 3*mm)
-
-
-        # --- اطلاعات عمومی فاکتور  ---
-        p.setFont("IranSans", 10)
-        line_spacing = 7 * mm
-        info_y_start = header_y_start - 20 * mm
-
-        info_x_right = width - 20 * mm  # سمت راست
-        info_x_left = 20 * mm          # سمت چپ
-
-        customer_display_name = customer.name if hasattr(customer, 'name') else customer
-        phone_number = getattr(customer, 'phone_number', '-') if hasattr(customer, 'phone_number') else '-'
-        if phone_number is None:
-            phone_number = "_"        
-        # ردیف اول: مشتری - شماره فاکتور
-        # factor obj
-        total_sum = 0
-        total_payment = 0
-        total_remaining = 0
-        factor = Factor.objects.create(
-            total_remaining=total_remaining,
-            total_cost=total_sum,
-            total_payment=total_payment,
-            customer=order.customer_name,
-            company=order.company_name
+            yield
+            draw_factor_header(p, factor, customer_display_name, phone_number)
+            table_bottom = TABLE_Y
+
+        draw_factor_totals(p, table_bottom, total_sum, total_payment, total_remaining)
+        return total_sum, total_payment, total_remaining
+
+
+# everything from an order and its company that is drawn on a factor
+FACTOR_CONTENT_FIELDS = (
+    'company_name_id', 'customer_name', 'company_name__name', 'company_name__phone_number',
+    'id', 'title', 'width', 'height', 'amount', 'unit_cost', 'total_cost', 'payment', 'remaining_payment',
+)
+
+
+def enqueue_factor_job(queryset):
+    return FactorJob.objects.create(order_ids=list(queryset.values_list('id', flat=True)))
+
+
+def factor_orders(queryset):
+    # سفارش‌های هر مشتری پشت سر هم، به ترتیب ردیف‌های فاکتور
+    return queryset.order_by('company_name_id', 'customer_name', '-order_date', 'id')
+
+
+def factor_customers(queryset):
+    """
+    Read the selected orders once, in factor order, and return an unsaved
+    Factor per customer, with its totals already summed, together with the
+    content key of the whole selection for the PDF cache.
+    """
+    hasher = factor_content_hasher()
+    factors = []
+    key = None
+    for row in factor_orders(queryset).values_list(*FACTOR_CONTENT_FIELDS).iterator():
+        company_id, customer_name = row[:2]
+        total_cost, payment, remaining_payment = row[-3:]
+        row_key = (company_id, None) if company_id else (None, customer_name)
+        if row_key != key:
+            key = row_key
+            factors.append(Factor(company_id=key[0], customer=key[1]))
+        factor = factors[-1]
+        factor.total_cost += total_cost
+        factor.total_payment += payment
+        factor.total_remaining += remaining_payment
+        hasher.update(repr(row).encode())
+    return factors, hasher.hexdigest()
+
+
+def iter_factor_groups(factors, queryset, factor_done=None):
+    """
+    Pair each of `factors` with the orders of its customer group in
+    `queryset`. Orders are read in chunks, so memory use does not grow with
+    the number of orders or customers. `factor_done(count)`, if given, is
+    called when the consumer asks for the group after `count` factors.
+    """
+    orders = factor_orders(queryset.select_related('company_name')).iterator(chunk_size=ROWS_PER_PAGE * 10)
+
+    for done, (factor, (key, group)) in enumerate(zip(factors, groupby(orders, key=order_customer_key)), start=1):
+        yield factor, group
+        if factor_done:
+            factor_done(done)
+
+
+def create_factors(factors):
+    # همه فاکتورها در یک تراکنش و یک درج گروهی؛ شماره‌ها پیش از رسم مشخص می‌شوند
+    with transaction.atomic():
+        return Factor.objects.bulk_create(factors)
+
+
+def stream_factor_pdf(groups):
+    """Yield the PDF for `groups` of (factor, orders) one page at a time."""
+    chunks = []
+    p = StreamingCanvas(chunks.append, pagesize=A4, initialFontName='IranSans')
+
+    for factor, orders in groups:
+        # هر صفحه به محض پایان فرستاده می‌شود، حتی در فاکتور چندصفحه‌ای یک مشتری
+        for _ in draw_factor(p, factor, orders):
+            yield b''.join(chunks)
+            chunks.clear()
+        p.showPage()
+
+        yield b''.join(chunks)
+        chunks.clear()
+
+    p.finish() # ذخیره نهایی PDF
+    yield b''.join(chunks)
+
+
+# --- Parallel rendering ---
+
+factor_pool = None
+factor_pool_workers = 0
+
+
+def get_factor_pool(workers):
+    global factor_pool, factor_pool_workers
+    if factor_pool is None or factor_pool_workers != workers:
+        if factor_pool is not None:
+            factor_pool.shutdown(wait=False)
+        # spawn, as on Windows, so workers never inherit the server's threads
+        factor_pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_django_worker,
         )
-        factor_ids.append(factor.id)
-
-        p.drawRightString(info_x_right, info_y_start, get_farsi_text(f"مشتری: {customer_display_name}"))
-        p.drawString(info_x_left, info_y_start, get_farsi_text(f"شماره: {factor.id}"))
-
-        # ردیف دوم: شماره تلفن - تاریخ
-        p.drawRightString(info_x_right, info_y_start - line_spacing, get_farsi_text(f"شماره تلفن: {phone_number}"))
-        p.drawString(info_x_left, info_y_start - line_spacing, get_farsi_text("تاریخ: __/__/__14"))
-
-        # --- خطوط افقی جداکننده هدر ---
-        p.line(15 * mm, header_y_start - 10 * mm, width - 15 * mm, header_y_start - 10 * mm)  # خط زیر عنوان اصلی
-        p.line(15 * mm, info_y_start - 2.5 * line_spacing, width - 15 * mm, info_y_start - 2.5 * line_spacing)  # خط زیر اطلاعات عمومی
-
-        # --- جدول اصلی فاکتور ---
-        table_y_start = info_y_start - 2.5 * line_spacing - 5*mm # شروع جدول
-        table_col_widths = list(reversed([
-            10 * mm,   # ردیف
-            45 * mm,   # عنوان
-            25 * mm,   # ابعاد
-            15 * mm,   # تعداد
-            28 * mm,   # مبلغ واحد
-            28 * mm,   # مبلغ کل
-            28 * mm,   # پرداختی
-            28 * mm,   # باقیمانده
-        ]))
-
-        table_row_height = 8*mm # ارتفاع هر ردیف
-
-        # سربرگ جدول
-        table_header = list(reversed([
-            Paragraph(get_farsi_text("ردیف"), farsi_paragraph_style_table),
-            Paragraph(get_farsi_text("عنوان"), farsi_paragraph_style_table),
-            Paragraph(get_farsi_text("ابعاد"), farsi_paragraph_style_table),
-            Paragraph(get_farsi_text("تعداد"), farsi_paragraph_style_table),
-            Paragraph(get_farsi_text("مبلغ واحد به ریال"), farsi_paragraph_style_table),
-            Paragraph(get_farsi_text("مبلغ کل به ریال"), farsi_paragraph_style_table),
-            Paragraph(get_farsi_text("مبلغ پرداختی به ریال"), farsi_paragraph_style_table),
-            Paragraph(get_farsi_text("مبلغ باقیمانده به ریال"), farsi_paragraph_style_table)
-        ]))
-
-        table_data = [table_header]
-        for i, order in enumerate(orders, start=1):
-            dimensions = f"{order.width} * {order.height}"
-            amount_text = get_farsi_text(str(order.amount))
-            unit_cost_text = get_farsi_text(f'{order.unit_cost:,.0f}')
-            total_cost_text = get_farsi_text(f'{order.total_cost:,.0f}')
-            payment_text = get_farsi_text(f'{order.payment:,.0f}')
-            remaining_text = get_farsi_text(f'{order.remaining_payment:,.0f}')
-            
-            row = list(reversed([
-                Paragraph(get_farsi_text(str(i)), farsi_paragraph_style_table),
-                Paragraph(get_farsi_text(order.title or ''), farsi_paragraph_style_table),
-                Paragraph(get_farsi_text(dimensions), farsi_paragraph_style_table),
-                Paragraph(amount_text, farsi_paragraph_style_table),
-                Paragraph(unit_cost_text, farsi_paragraph_style_table),
-                Paragraph(total_cost_text, farsi_paragraph_style_table),
-                Paragraph(payment_text, farsi_paragraph_style_table),
-                Paragraph(remaining_text, farsi_paragraph_style_table)
-            ]))
-
-            table_data.append(row)
+        factor_pool_workers = workers
+    return factor_pool
 
-            total_sum += order.total_cost
-            total_remaining += order.remaining_payment
-            total_payment += order.payment
 
-        factor.total_cost = total_sum
-        factor.total_payment = total_payment
-        factor.total_remaining = total_remaining
-        factor.save()
-                    
-        # تعریف استایل جدول
-        table_style = TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.Color(0.9, 0.9, 0.9)),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('FONTNAME', (0, 0), (-1, -1), 'IranSans'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('LEFTPADDING', (0, 0), (-1, -1), 2),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 2),
-            ('ALIGN', (4, 1), (-1, -1), 'RIGHT'),
-            ('ALIGN', (0, 1), (3, -1), 'CENTER'),
-        ])
-
-
-        # ساخت جدول Platypus
-        table = Table(table_data, colWidths=table_col_widths, rowHeights=table_row_height)
-        table.setStyle(table_style)
-
-        table_width, table_height = table.wrapOn(p, width, height)
-        table_x = (width - table_width) / 2
-        p.saveState() # برای اطمینان از اینکه تغییرات در حالت canvas فقط برای این بخش اعمال شود
-        table.drawOn(p, table_x, table_y_start - table_height)
-        p.restoreState()
-
-        # تنظیم فونت
-        p.setFont("IranSans", 10)
-
-        # موقعیت راست صفحه
-        total_x_right = width - 10 * mm
-
-        # شروع از زیر جدول
-        line_height = 7 * mm
-        block_spacing = 2 * mm
-        footer_y = table_y_start - table_height - 10 * mm
-
-        # --- جمع کل ---
-        p.drawRightString(total_x_right, footer_y, get_farsi_text(f"جمع کل: {total_sum:,.0f} ریال"))
-        p.drawRightString(total_x_right, footer_y - line_height, get_farsi_text(f"مبلغ به حروف: {words(total_sum)} ریال"))
-
-        # --- پرداختی ---
-        footer_y -= 2 * line_height + block_spacing
-        p.drawRightString(total_x_right, footer_y, get_farsi_text(f"جمع کل پرداختی: {total_payment:,.0f} ریال"))
-        p.drawRightString(total_x_right, footer_y - line_height, get_farsi_text(f"مبلغ به حروف: {words(total_payment)} ریال"))
-
-        # --- باقیمانده ---
-        footer_y -= 2 * line_height + block_spacing
-        p.drawRightString(total_x_right, footer_y, get_farsi_text(f"جمع کل بدهی باقیمانده: {total_remaining:,.0f} ریال"))
-        p.drawRightString(total_x_right, footer_y - line_height, get_farsi_text(f"مبلغ به حروف: {words(total_remaining)} ریال"))
-
-
-        # فاصله‌ای برای جدا شدن فوتر از اطلاعات مالی بالا
-        footer_y_start = footer_y - 15 * mm
-        footer_line_spacing = 6 * mm
-
-        p.setFont("IranSans", 9)
-
-        # اطلاعات تماس
-        p.drawString(20 * mm, footer_y_start, get_farsi_text("تلفن: 061111111"))
-        p.drawString(20 * mm, footer_y_start - footer_line_spacing,
-                    get_farsi_text("شماره شبا: IR00000000000000000000"))
-
-        card_number = convert_to_farsi_numbers("0000-0000-0000-0000")
-        p.drawString(20 * mm, footer_y_start - 2 * footer_line_spacing,
-                    get_farsi_text(f"شماره کارت: {card_number}"))
-        p.drawString(20 * mm, footer_y_start - 3 * footer_line_spacing,
-                    get_farsi_text("بنام: شرکت ایده نو"))
-
-        # نوار مشکی پایین صفحه
-        p.setStrokeColor(colors.black)
-        p.setFillColor(colors.black)
-        p.rect(15 * mm, 15 * mm, width - 30 * mm, 0.2 * mm, fill=1)
-
-
-    p.save() # ذخیره نهایی PDF
+def render_factor_fragment(factor, orders):
+    """Render one factor as a standalone PDF; runs in a pool worker."""
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer, pagesize=A4, initialFontName='IranSans')
+    for _ in draw_factor(p, factor, orders):
+        pass
+    p.save()
+    return buffer.getvalue()
+
 
-    file_name = generate_safe_filename(factor_ids)
+def write_factor_pdf_parallel(groups, out, workers):
+    """
+    Render `groups` of (factor, orders) on a pool of `workers` processes and
+    write the fragments, merged in group order, to the file object `out`.
+    At most two groups per worker are in flight at a time.
+    """
+    pool = get_factor_pool(workers)
+    writer = PdfWriter()
+    pending = deque()
+
+    def merge_next():
+        fragment = pending.popleft().result()
+        writer.append(PdfReader(BytesIO(fragment)))
 
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{file_name}.pdf"'
+    for factor, orders in groups:
+        pending.append(pool.submit(render_factor_fragment, factor, list(orders)))
+        if len(pending) >= 2 * workers:
+            merge_next()
+    while pending:
+        merge_next()
+
+    writer.write(out)
+
+
+# --- Django Admin Action ---
+
+def generate_factor_pdf(modeladmin, request, queryset):
+    if not global_font_registered:
+        messages.error(request, "تولید PDF ناموفق: فونت فارسی به درستی بارگذاری نشده است. لطفاً گزارشات سرور را بررسی کنید.")
+        return HttpResponse("خطا: فونت فارسی بارگذاری نشده است.", status=500)
+
+    # انتخاب‌های بزرگ در پس‌زمینه ساخته می‌شوند تا درخواست منتظر نماند
+    queue_min_orders = settings.FACTOR_PDF_QUEUE_MIN_ORDERS
+    if queue_min_orders and queryset.count() >= queue_min_orders:
+        job = enqueue_factor_job(queryset)
+        messages.info(request, f"تولید فاکتور {len(job.order_ids)} سفارش در صف قرار گرفت.")
+        return redirect('admin:base_factorjob_change', job.id)
+
+    factors, content_key = factor_customers(queryset)
+
+    # چاپ دوباره همان سفارش‌ها: فاکتور قبلی بدون ساخت فاکتور جدید برگردانده می‌شود
+    use_cache = factor_cache_enabled()
+    if use_cache:
+        cached = get_cached_factor_pdf(content_key)
+        if cached:
+            path, factor_ids = cached
+            return FileResponse(open(path, 'rb'), as_attachment=True,
+                                filename=generate_safe_filename(factor_ids), content_type='application/pdf')
+
+    factors = create_factors(factors)
+    factor_ids = [factor.id for factor in factors]
+    file_name = generate_safe_filename(factor_ids)
+    groups = iter_factor_groups(factors, queryset)
+
+    workers = settings.FACTOR_PDF_WORKERS
+    if workers > 1 and len(factors) > 1:
+        out = open_factor_cache_entry() if use_cache else TemporaryFile()
+        try:
+            write_factor_pdf_parallel(groups, out, workers)
+        except BaseException:
+            out.close()
+            if use_cache:
+                discard_factor_cache_entry(out.name)
+            raise
+        if use_cache:
+            out.close()
+            commit_factor_cache_entry(content_key, out.name, factor_ids)
+            out = open(factor_cache_path(content_key), 'rb')
+        out.seek(0)
+        return FileResponse(out, as_attachment=True, filename=file_name, content_type='application/pdf')
+
+    chunks = stream_factor_pdf(groups)
+    if use_cache:
+        chunks = cache_factor_pdf(chunks, content_key, factor_ids)
+    response = StreamingHttpResponse(chunks, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{file_name}"'
     return response
 
 # نام قابل نمایش برای اکشن در پنل ادمین
@@ -0,0 +1,11 @@
+import os
+
+
+def init_django_worker():
+    """
+    Process pool initializer. Must not import anything that needs the app
+    registry, since it runs before Django is set up in a spawned worker.
+    """
+    import django
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    django.setup()
@@ -85,6 +85,7 @@ JALALI_DATE_DEFAULTS = {
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    'base.middleware.DeferredTransactionsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -116,10 +117,33 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# WAL lets the server threads read while one of them writes. base.sqlite
+# begins each transaction IMMEDIATE behind a per-process write lock and
+# retries writes that find the database locked by another process (the
+# factor worker) with backoff; transactions of GET requests begin DEFERRED
+# and take the lock at their first write (base.middleware).
+# SQLITE_WAL=0 falls back to Django's backend.
+SQLITE_WAL = os.environ.get('SQLITE_WAL', '1') != '0'
+SQLITE_WAL_OPTIONS = {
+    # busy_timeout, in seconds
+    'timeout': 5,
+    'transaction_mode': 'IMMEDIATE',
+    'init_command': ';'.join([
+        'PRAGMA journal_mode=WAL',
+        # in WAL mode a crash loses no committed transaction, only a power failure may
+        'PRAGMA synchronous=NORMAL',
+        # 32 MiB page cache per connection
+        'PRAGMA cache_size=-32768',
+        'PRAGMA mmap_size=268435456',
+        'PRAGMA temp_store=MEMORY',
+    ]),
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'base.sqlite' if SQLITE_WAL else 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': SQLITE_WAL_OPTIONS if SQLITE_WAL else {},
     }
 }
 
@@ -165,3 +189,42 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
+# On disk, so every server process and the factor worker share it: an
+# order saved in one process invalidates the cached order summaries of all.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'django_cache'),
+    }
+}
+
+# Number of worker processes used to render factor PDFs of several customers
+# in parallel; 0 or 1 renders them one after another on the request thread.
+FACTOR_PDF_WORKERS = int(os.environ.get('FACTOR_PDF_WORKERS', 0))
+
+# Rendered factor PDFs are kept on disk so printing the same orders again
+# serves the stored file; least recently used files are removed past the
+# size limit (bytes). 0 disables the cache.
+FACTOR_PDF_CACHE_DIR = os.path.join(BASE_DIR, 'factor_cache')
+FACTOR_PDF_CACHE_MAX_SIZE = int(os.environ.get('FACTOR_PDF_CACHE_MAX_SIZE', 500 * 1024 * 1024))
+
+# Factor runs of at least this many orders are rendered by the background
+# worker (manage.py run_factor_worker) instead of the request; 0 never queues.
+FACTOR_PDF_QUEUE_MIN_ORDERS = int(os.environ.get('FACTOR_PDF_QUEUE_MIN_ORDERS', 1000))
+FACTOR_JOB_DIR = os.path.join(BASE_DIR, 'factor_jobs')
+
+# run_waitress.py serves the app with SERVER_WORKERS processes sharing the
+# listening socket, each with SERVER_THREADS threads and at most
+# SERVER_CONNECTION_LIMIT open connections, so a slow factor render holds
+# up only its own process. Touching SERVER_RESTART_FILE restarts the
+# workers one by one; a stopping worker answers its requests in progress
+# for up to SERVER_GRACEFUL_TIMEOUT seconds.
+SERVER_HOST = os.environ.get('SERVER_HOST', '0.0.0.0')
+SERVER_PORT = int(os.environ.get('SERVER_PORT', 8000))
+SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', min(os.cpu_count() or 1, 4)))
+SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 4))
+SERVER_CONNECTION_LIMIT = int(os.environ.get('SERVER_CONNECTION_LIMIT', 100))
+SERVER_BACKLOG = int(os.environ.get('SERVER_BACKLOG', 1024))
+SERVER_GRACEFUL_TIMEOUT = int(os.environ.get('SERVER_GRACEFUL_TIMEOUT', 30))
+SERVER_RESTART_FILE = os.path.join(BASE_DIR, 'restart.txt')
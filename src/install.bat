@@ -10,12 +10,7 @@ python-embed\python.exe -m ensurepip
 python-embed\python.exe -m pip install --upgrade pip
 python-embed\python.exe -m pip install -r requirements.txt
 
-REM ── apply migrations ──
-python-embed\python.exe manage.py collectstatic --noinput
-python-embed\python.exe manage.py makemigrations --noinput
-python-embed\python.exe manage.py migrate
-
-REM ── start server ──
+REM ── start server; collectstatic and migrate run first if anything changed ──
 python-embed\python.exe run_waitress.py
 
 
@@ -6,12 +6,7 @@ REM ── force Python to search this folder first ──
 set PYTHONPATH=%~dp0
 
 
-REM ── apply migrations ──
-python-embed\python.exe manage.py collectstatic --noinput
-python-embed\python.exe manage.py makemigrations --noinput
-python-embed\python.exe manage.py migrate
-
-REM ── start server ──
+REM ── start server; collectstatic and migrate run first if anything changed ──
 python-embed\python.exe run_waitress.py
 
 popd
@@ -1,18 +1,226 @@
-#!/usr/bin/env python
-import os, sys
-
-# Ensure project root is on sys.path and cwd
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-if BASE_DIR not in sys.path:
-    sys.path.insert(0, BASE_DIR)
-os.chdir(BASE_DIR)
-
-# Django & Waitress imports
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
-from django.core.wsgi import get_wsgi_application
-from waitress import serve
-
-application = get_wsgi_application()
-
-if __name__ == "__main__":
-    serve(application, host='0.0.0.0', port=8000)
+#!/usr/bin/env python
+"""
+Serve the app with several Waitress worker processes sharing one listening
+socket, so a slow request (a factor PDF render) holds up only the threads
+of its own process. Defaults come from the SERVER_* settings.
+
+Workers that die are replaced. Touching SERVER_RESTART_FILE (or SIGHUP)
+restarts them one by one: a new worker starts before the old one stops
+accepting, and the old one exits once its requests are answered or after
+the graceful timeout. If a new worker fails to load the app, the restart
+stops there and the running workers keep serving. Ctrl+C or SIGTERM stops
+all of them the same way.
+
+Before serving, collectstatic and migrate run only if something they
+would do changed (base.startup), and the time of each stage is logged.
+"""
+import time
+
+# ابتدای راه‌اندازی، برای گزارش زمان هر مرحله
+START = time.perf_counter()
+
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+
+# Ensure project root is on sys.path and cwd
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+os.chdir(BASE_DIR)
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+
+logger = logging.getLogger('run_waitress')
+
+# ثانیه‌هایی که یک worker تازه برای بارگذاری برنامه فرصت دارد
+WORKER_READY_TIMEOUT = 60
+
+
+def parse_options(argv=None):
+    from django.conf import settings
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default=settings.SERVER_HOST)
+    parser.add_argument('--port', type=int, default=settings.SERVER_PORT)
+    parser.add_argument('--workers', type=int, default=settings.SERVER_WORKERS, help="Worker processes.")
+    parser.add_argument('--threads', type=int, default=settings.SERVER_THREADS, help="Threads per worker.")
+    parser.add_argument('--connection-limit', type=int, default=settings.SERVER_CONNECTION_LIMIT,
+                        help="Open connections per worker; more wait in the listen backlog.")
+    parser.add_argument('--backlog', type=int, default=settings.SERVER_BACKLOG)
+    parser.add_argument('--graceful-timeout', type=float, default=settings.SERVER_GRACEFUL_TIMEOUT,
+                        help="Seconds a stopping worker waits for its requests in progress.")
+    parser.add_argument('--restart-file', default=settings.SERVER_RESTART_FILE)
+    parser.add_argument('--no-factor-worker', dest='factor_worker', action='store_false',
+                        help="Do not start manage.py run_factor_worker.")
+    parser.add_argument('--no-prepare', dest='prepare', action='store_false',
+                        help="Do not run collectstatic and migrate before serving.")
+    parser.add_argument('--full-prepare', action='store_true',
+                        help="Run collectstatic and migrate even if nothing changed.")
+    return parser.parse_args(argv)
+
+
+# --- Worker process ---
+
+def close_idle_channels(server):
+    # اتصال‌های keep-alive بدون درخواست در جریان بسته می‌شوند؛ بقیه پس از پاسخ
+    for channel in list(server.active_channels.values()):
+        if not channel.requests and channel.request is None:
+            channel.will_close = True
+
+
+def drain(server, stop, graceful_timeout):
+    """Wait for `stop` (or the launcher to die), then stop accepting and end the server loop once idle."""
+    from waitress import wasyncore
+
+    launcher = multiprocessing.parent_process()
+    while not stop.wait(1):
+        if launcher is not None and not launcher.is_alive():
+            break
+    # the socket stays open in the other workers
+    server.trigger.pull_trigger(lambda: wasyncore.dispatcher.close(server))
+    deadline = time.monotonic() + graceful_timeout
+    while server.active_channels and time.monotonic() < deadline:
+        server.trigger.pull_trigger(lambda: close_idle_channels(server))
+        time.sleep(0.1)
+    # an empty map ends the loop
+    server.trigger.pull_trigger(lambda: wasyncore.close_all(server._map))
+
+
+def serve_worker(sock, options, stop, ready):
+    from waitress import create_server
+    from core.wsgi import application
+
+    logging.basicConfig(level=logging.INFO)
+    # Ctrl+C reaches every process of the console; the launcher stops the workers gracefully
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    server = create_server(
+        application, sockets=[sock], threads=options.threads,
+        connection_limit=options.connection_limit, backlog=options.backlog,
+    )
+    threading.Thread(target=drain, args=(server, stop, options.graceful_timeout), daemon=True).start()
+    ready.set()
+    try:
+        server.run()
+    finally:
+        server.task_dispatcher.shutdown()
+
+
+# --- Launcher ---
+
+class Launcher:
+    def __init__(self, options):
+        self.options = options
+        self.context = multiprocessing.get_context('spawn')
+        self.workers = []
+        # set by signal handlers, so plain flags: a handler must not wait for a lock the loop may hold
+        self.stopping = False
+        self.restart_requested = False
+
+    def start_worker(self):
+        stop, ready = self.context.Event(), self.context.Event()
+        process = self.context.Process(
+            target=serve_worker, args=(self.socket, self.options, stop, ready), name='waitress-worker')
+        process.start()
+        logger.info("worker %s started", process.pid)
+        return process, stop, ready
+
+    def stop_workers(self, workers):
+        for process, stop, ready in workers:
+            stop.set()
+        for process, stop, ready in workers:
+            process.join(self.options.graceful_timeout + 5)
+            if process.is_alive():
+                logger.warning("worker %s did not stop in time", process.pid)
+                process.terminate()
+                process.join()
+            logger.info("worker %s stopped", process.pid)
+
+    def wait_ready(self, worker):
+        """Whether `worker` loaded the app in time; False as soon as it exits."""
+        process, stop, ready = worker
+        deadline = time.monotonic() + WORKER_READY_TIMEOUT
+        while not ready.wait(0.5):
+            if not process.is_alive() or time.monotonic() > deadline:
+                return False
+        return True
+
+    def restart(self):
+        logger.info("restarting workers")
+        for i, worker in enumerate(self.workers):
+            new_worker = self.start_worker()
+            # the old worker keeps accepting until the new one has loaded the app
+            if not self.wait_ready(new_worker):
+                # e.g. an import error in newly deployed code: the old workers keep serving
+                process = new_worker[0]
+                logger.error("worker %s did not start (exit code %s), keeping the running workers",
+                             process.pid, process.exitcode)
+                process.terminate()
+                process.join()
+                return
+            self.workers[i] = new_worker
+            self.stop_workers([worker])
+
+    def restart_file_mtime(self):
+        try:
+            return os.stat(self.options.restart_file).st_mtime
+        except OSError:
+            return None
+
+    def run(self):
+        import django
+        from base.startup import StartupTimer, prepare
+
+        options = self.options
+        timer = StartupTimer(START)
+        if options.prepare:
+            with timer.stage('django setup'):
+                django.setup()
+            prepare(timer, full=options.full_prepare)
+        self.socket = socket.create_server((options.host, options.port), backlog=options.backlog)
+        for sig in ('SIGINT', 'SIGTERM'):
+            signal.signal(getattr(signal, sig), lambda *args: setattr(self, 'stopping', True))
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, lambda *args: setattr(self, 'restart_requested', True))
+
+        factor_worker = None
+        if options.factor_worker:
+            # background worker for queued factor jobs
+            factor_worker = subprocess.Popen([sys.executable, os.path.join(BASE_DIR, 'manage.py'), 'run_factor_worker'])
+        restart_mtime = self.restart_file_mtime()
+        with timer.stage('workers'):
+            self.workers = [self.start_worker() for _ in range(options.workers)]
+            for worker in self.workers:
+                self.wait_ready(worker)
+        logger.info("serving on http://%s:%s with %d workers x %d threads",
+                    options.host, options.port, options.workers, options.threads)
+        logger.info("startup: %s", timer.report())
+        try:
+            while not self.stopping:
+                mtime = self.restart_file_mtime()
+                if mtime != restart_mtime or self.restart_requested:
+                    restart_mtime = mtime
+                    self.restart_requested = False
+                    self.restart()
+                for i, (process, stop, ready) in enumerate(self.workers):
+                    if not process.is_alive():
+                        logger.warning("worker %s exited with %s, starting another", process.pid, process.exitcode)
+                        self.workers[i] = self.start_worker()
+                time.sleep(1)
+        finally:
+            self.stop_workers(self.workers)
+            self.socket.close()
+            if factor_worker is not None:
+                factor_worker.terminate()
+                factor_worker.wait()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    Launcher(parse_options()).run()
@@ -0,0 +1,14 @@
+'use strict';
+// انتخاب شرکت در فیلتر شرکت، لیست را به همان شرکت محدود می‌کند
+document.addEventListener('DOMContentLoaded', function () {
+    // بعد از بارگذاری صفحه، چون jquery.init.js ممکن است بعد از این فایل بیاید
+    django.jQuery('select.company-filter').on('change', function () {
+        if (!this.value) {
+            return;
+        }
+        const queryString = this.dataset.queryString;
+        const separator = queryString.length > 1 ? '&' : '';
+        window.location.search = queryString + separator +
+            encodeURIComponent(this.dataset.parameterName) + '=' + encodeURIComponent(this.value);
+    });
+});